@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import itertools
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+from generate_undata import synthetic_areas, UN_VARIANTS
+from area_table import AreaTable
+from age_cube import AgeCube, create_age_cube
+from data_processing import calculate_weighted_life_expectancy, prepare_area_life_expectancy_df
+
+GENDERS = ['both', 'male', 'female']
+
+def _rss_mib():
+    """Current resident set size of this process (Linux /proc)."""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+def write_synthetic_cube(path, n_areas, n_years, n_ages, n_variants, seed=0):
+    """
+    Write a synthetic age cube block by block (one variant and age at a time), so building
+    it needs no more memory than one block. Life expectancy falls roughly linearly with age.
+    Returns:
+        AgeCube
+    """
+    rng = np.random.default_rng(seed)
+    areas, years = synthetic_areas(n_areas), list(range(2100 - n_years, 2100))
+    cube = create_age_cube(path, areas, GENDERS, years, range(n_ages), UN_VARIANTS[:n_variants])
+    e0 = rng.normal(70, 7, size=(n_areas, 1, 1)) + np.array([0, -2.5, 2.5])[None, :, None] \
+        + 0.15 * np.arange(n_years)[None, None, :]
+    for v, variant in enumerate(cube.variants):
+        for age in cube.ages:
+            block = np.maximum(e0 * (1 - age / 110) + 0.1 * v, 0.5)
+            cube.write_block(variant, age, block.astype(np.float32))
+        cube.flush()
+    return cube
+
+def query(path, eager=False):
+    """
+    Open a cube in this (fresh) process and run the pipeline on one slice (Medium, e0):
+    weighted global series (equal population weights) plus the long DataFrame the plots use.
+    With eager, the whole cube is read into memory first, as a pandas/NumPy load would.
+    Returns:
+        dict with seconds and RSS before and after the query
+    """
+    rss_before = _rss_mib()
+    start = time.perf_counter()
+    cube = AgeCube(path)
+    if eager:
+        cube.data = np.array(cube.data) # Baseline: every value resident
+    life = cube.slice(cube.variants[0], 0)
+    ones = np.ones(len(cube.areas) * len(cube.genders) * len(cube.years))
+    a, g, y = np.unravel_index(np.arange(len(ones)), (len(cube.areas), len(cube.genders), len(cube.years)))
+    pop = AreaTable(cube.areas, cube.genders, a, g, np.asarray(cube.years)[y], ones) # Equal weights
+    calculate_weighted_life_expectancy(life, pop)
+    prepare_area_life_expectancy_df(life)
+    return {'seconds': time.perf_counter() - start, 'rss_before_mib': rss_before, 'rss_after_mib': _rss_mib()}
+
+def benchmark_size(n_areas, n_years, n_ages, n_variants, eager_limit_mib):
+    """Build a cube of the given size and measure lazy (and, below the limit, eager) queries in fresh processes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cube.npy')
+        started = time.perf_counter()
+        cube = write_synthetic_cube(path, n_areas, n_years, n_ages, n_variants)
+        result = {'areas': n_areas, 'years': n_years, 'ages': n_ages, 'variants': n_variants,
+                  'cube_mib': cube.nbytes / 2 ** 20, 'build_s': time.perf_counter() - started}
+        del cube
+        modes = ['lazy'] + (['eager'] if result['cube_mib'] <= eager_limit_mib else [])
+        for mode in modes:
+            cmd = [sys.executable, os.path.abspath(__file__), '--query', path] + (['--eager'] if mode == 'eager' else [])
+            proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result[mode] = json.loads(proc.stdout)
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RSS of slice queries on memory-mapped age cubes of growing size")
+    parser.add_argument("--areas", type=int, nargs="+", default=[1000])
+    parser.add_argument("--years", type=int, default=151)
+    parser.add_argument("--ages", type=int, nargs="+", default=[101])
+    parser.add_argument("--variants", type=int, nargs="+", default=[1, 3, 9],
+                        help="Variant counts; the cube grows with them while the queried slice stays the same size")
+    parser.add_argument("--eager-limit", type=float, default=1200, help="Largest cube (MiB) also loaded eagerly")
+    parser.add_argument("--output", help="Optional JSON output path")
+    parser.add_argument("--query", help=argparse.SUPPRESS) # Internal: run one query in this process
+    parser.add_argument("--eager", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.query:
+        print(json.dumps(query(args.query, args.eager)))
+        raise SystemExit
+
+    results = []
+    print(f"{'size':<16} {'cube MiB':>9} {'build s':>8} {'lazy s':>7} {'lazy RSS MiB':>13} {'eager RSS MiB':>14}")
+    for n_areas, n_ages, n_variants in itertools.product(args.areas, args.ages, args.variants):
+        r = benchmark_size(n_areas, args.years, n_ages, n_variants, args.eager_limit)
+        results.append(r)
+        eager = f"{r['eager']['rss_after_mib']:.1f}" if 'eager' in r else 'skipped'
+        print(f"{f'{n_areas}x{n_ages}x{n_variants}':<16} {r['cube_mib']:>9.1f} {r['build_s']:>8.2f} "
+              f"{r['lazy']['seconds']:>7.3f} {r['lazy']['rss_after_mib']:>13.1f} {eager:>14}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results}, f, indent=2)
@@ -0,0 +1,76 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import itertools
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from generate_undata import generate_undata, synthetic_areas
+from area_table import AreaTable
+from undata import read_undata_csv
+from data_processing import (build_area_year_index, extract_values, calculate_mean_life_expectancy,
+                             prepare_area_life_expectancy_df)
+
+def nested_mean_life_expectancy(life_dfs, areas, years):
+    """The previous nested area -> gender -> year dict representation, kept as the baseline."""
+    indexes = {g: build_area_year_index(df) for g, df in life_dfs.items()}
+    return {area: {g: extract_values(idx, area, years) for g, idx in indexes.items()} for area in areas}
+
+def _measure(fn, *args):
+    """Run fn once under tracemalloc; return (result, seconds, retained MiB, peak MiB)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, current / 2 ** 20, peak / 2 ** 20
+
+def benchmark_size(n_areas, n_years, seed=0):
+    """
+    Compare nested dicts with AreaTable for building the area values and flattening them to a DataFrame.
+    Returns:
+        dict with the size and per-representation build/flatten seconds and MiB
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        life_paths, _ = generate_undata(os.path.join(tmp, 'raw'), n_areas, n_years, seed=seed)
+        life_dfs = {g: read_undata_csv(p, variants='Medium') for g, p in life_paths.items()}
+    areas = synthetic_areas(n_areas)
+    years = range(2019, 2019 + n_years)
+
+    result = {'areas': n_areas, 'years': n_years, 'values': n_areas * n_years * len(life_dfs)}
+    for name, build in (('nested_dict', nested_mean_life_expectancy), ('area_table', calculate_mean_life_expectancy)):
+        values, build_s, retained_mib, build_peak_mib = _measure(build, life_dfs, areas, years)
+        _, flatten_s, _, flatten_peak_mib = _measure(prepare_area_life_expectancy_df, values)
+        result[name] = {'build_s': build_s, 'retained_mib': retained_mib, 'build_peak_mib': build_peak_mib,
+                        'flatten_s': flatten_s, 'flatten_peak_mib': flatten_peak_mib}
+        if isinstance(values, AreaTable):
+            result[name]['array_mib'] = values.nbytes / 2 ** 20
+        del values
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory and time of nested dicts vs AreaTable for area values")
+    parser.add_argument("--areas", type=int, nargs="+", default=[300, 3000])
+    parser.add_argument("--years", type=int, nargs="+", default=[150])
+    parser.add_argument("--output", help="Optional JSON output path")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'size':<12} {'representation':<12} {'build s':>8} {'held MiB':>9} {'peak MiB':>9} "
+          f"{'to_df s':>8} {'to_df MiB':>10}")
+    for n_areas, n_years in itertools.product(args.areas, args.years):
+        r = benchmark_size(n_areas, n_years)
+        results.append(r)
+        for name in ('nested_dict', 'area_table'):
+            m = r[name]
+            print(f"{f'{n_areas}x{n_years}':<12} {name:<12} {m['build_s']:>8.3f} {m['retained_mib']:>9.1f} "
+                  f"{m['build_peak_mib']:>9.1f} {m['flatten_s']:>8.3f} {m['flatten_peak_mib']:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results}, f, indent=2)
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MAIN = os.path.join('src', 'main.py')
+
+# CLI modes to measure; --no-cache forces the plots and stats to actually run
+MODES = {
+    'import main': None,
+    'global, no stats': ['--plot', 'global', '--no-stats', '--no-cache'],
+    'area, no stats': ['--plot', 'area', '--no-stats', '--no-cache'],
+    'animated, no stats': ['--plot', 'animated', '--no-stats', '--no-cache'],
+    'global + stats': ['--plot', 'global', '--no-cache'],
+}
+
+HEAVY_MODULES = ['pandas', 'matplotlib', 'matplotlib.pyplot', 'plotly', 'plotly.express', 'scipy', 'scipy.stats']
+
+def parse_importtime(stderr):
+    """
+    Parse `python -X importtime` output.
+    Returns:
+        list of (self_us, cumulative_us, name) tuples in output order
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+def measure(args):
+    """Run one CLI mode under -X importtime and return (total import ms, heavy module ms)."""
+    if args is None:
+        cmd = [sys.executable, '-X', 'importtime', '-c', 'import main']
+        env = dict(os.environ, PYTHONPATH=os.path.join(REPO_ROOT, 'src'))
+    else:
+        cmd = [sys.executable, '-X', 'importtime', MAIN] + args
+        env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as output_dir: # Plots go here, so the tracked data/output stays untouched
+        env['LIFE_EXPECTANCY_OUTPUT_DIR'] = output_dir
+        proc = subprocess.run(cmd, cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+
+    rows = parse_importtime(proc.stderr)
+    total_ms = sum(self_us for self_us, _, _ in rows) / 1000
+    heavy = {}
+    for _, cumulative_us, name in rows:
+        if name in HEAVY_MODULES and name not in heavy:
+            heavy[name] = cumulative_us / 1000
+    return total_ms, heavy
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report import time per CLI mode using python -X importtime")
+    parser.add_argument("--output", help="Optional JSON output path")
+    args = parser.parse_args()
+
+    report = {}
+    print(f"{'Mode':<22} {'Imports ms':>11}  Heavy modules loaded (cumulative ms)")
+    for mode, mode_args in MODES.items():
+        total_ms, heavy = measure(mode_args)
+        report[mode] = {'import_ms': total_ms, 'heavy_modules_ms': heavy}
+        loaded = ', '.join(f'{m} {ms:.0f}' for m, ms in heavy.items()) or '-'
+        print(f"{mode:<22} {total_ms:>11.0f}  {loaded}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
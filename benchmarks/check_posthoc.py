@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from stats_utils import studentized_range_sf, pairwise_posthoc, adjust_pvalues
+
+# Accuracy required of the hand-written studentized range quadrature against scipy
+SF_ATOL = 5e-5
+SF_RTOL = 2e-3 # Relative error, checked where scipy's p-value is at least SF_RTOL_FROM
+SF_RTOL_FROM = 1e-4
+
+def check_studentized_range(ks, dofs, n_q=12):
+    """
+    Compare studentized_range_sf with scipy.stats.studentized_range.sf on a (k, dof, q) grid.
+    For each (k, dof) the q values span p-values from about 0.9 down to 1e-6.
+    Returns:
+        pd.DataFrame with the largest absolute and relative error per (k, dof)
+    """
+    rows = []
+    for k in ks:
+        for dof in dofs:
+            q = stats.studentized_range.isf(np.geomspace(0.9, 1e-6, n_q), k, dof)
+            expected = stats.studentized_range.sf(q, k, dof)
+            got = studentized_range_sf(q, k, dof)
+            abs_err = np.abs(got - expected)
+            rel = expected >= SF_RTOL_FROM
+            rows.append({'k': k, 'dof': dof, 'max_abs_err': abs_err.max(),
+                         'max_rel_err': (abs_err[rel] / expected[rel]).max() if rel.any() else 0.0})
+    table = pd.DataFrame(rows)
+    table['ok'] = (table['max_abs_err'] <= SF_ATOL) & (table['max_rel_err'] <= SF_RTOL)
+    return table
+
+def synthetic_groups(n_groups, seed=0):
+    """Long DataFrame of groups with unequal sizes, means and variances."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for g in range(n_groups):
+        n = int(rng.integers(4, 30))
+        frames.append(pd.DataFrame({'area': f'g{g:03d}', 'life_expectancy': rng.normal(70 + rng.normal(0, 2), rng.uniform(0.5, 4), n)}))
+    return pd.concat(frames, ignore_index=True)
+
+def check_pairwise(n_groups=8, seed=0):
+    """
+    Compare pairwise_posthoc p-values with scipy: Welch with ttest_ind(equal_var=False), Tukey with
+    tukey_hsd, and Games-Howell with studentized_range.sf evaluated pair by pair.
+    Returns:
+        dict method -> largest absolute p-value difference
+    """
+    df = synthetic_groups(n_groups, seed)
+    groups = [g['life_expectancy'].to_numpy() for _, g in df.groupby('area', sort=False)]
+    i, j = np.triu_indices(len(groups), k=1)
+    errors = {}
+
+    welch = pairwise_posthoc(df, method='welch', correction='none')
+    expected = [stats.ttest_ind(groups[a], groups[b], equal_var=False).pvalue for a, b in zip(i, j)]
+    errors['welch'] = np.abs(welch['p-value'].to_numpy() - expected).max()
+
+    tukey = pairwise_posthoc(df, method='tukey', correction='none')
+    expected = stats.tukey_hsd(*groups).pvalue[i, j]
+    errors['tukey'] = np.abs(tukey['p-value'].to_numpy() - expected).max()
+
+    games_howell = pairwise_posthoc(df, method='games-howell', correction='none')
+    n = np.array([len(g) for g in groups])
+    se = np.array([g.var(ddof=1) / len(g) for g in groups])
+    dof = (se[i] + se[j]) ** 2 / (se[i] ** 2 / (n[i] - 1) + se[j] ** 2 / (n[j] - 1))
+    q = np.abs([groups[a].mean() - groups[b].mean() for a, b in zip(i, j)]) / np.sqrt((se[i] + se[j]) / 2)
+    expected = [stats.studentized_range.sf(qq, len(groups), d) for qq, d in zip(q, dof)]
+    errors['games-howell'] = np.abs(games_howell['p-value'].to_numpy() - expected).max()
+    return errors
+
+def check_corrections(n=200, seed=0):
+    """
+    Compare adjust_pvalues with scipy's false_discovery_control (BH) and a direct Holm step-down loop.
+    Returns:
+        dict correction -> largest absolute difference
+    """
+    rng = np.random.default_rng(seed)
+    p = np.concatenate([rng.uniform(0, 1, n), rng.uniform(0, 1e-3, n // 4)])
+    errors = {'bh': np.abs(adjust_pvalues(p, 'bh') - stats.false_discovery_control(p, method='bh')).max()}
+
+    order = np.argsort(p, kind='stable')
+    holm = np.empty_like(p)
+    running = 0.0
+    for rank, idx in enumerate(order): # Textbook step-down: running max of (m - rank) * p
+        running = max(running, (len(p) - rank) * p[idx])
+        holm[idx] = min(running, 1.0)
+    errors['holm'] = np.abs(adjust_pvalues(p, 'holm') - holm).max()
+    return errors
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the post-hoc p-values and corrections against scipy; "
+                                                 "exits non-zero on a regression")
+    parser.add_argument("--ks", type=int, nargs="+", default=[2, 3, 7, 20, 220], help="Numbers of groups")
+    parser.add_argument("--dofs", type=float, nargs="+", default=[2, 5, 10, 30, 120, 1000], help="Degrees of freedom")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    failed = False
+
+    table = check_studentized_range(args.ks, args.dofs)
+    print("=== studentized_range_sf vs scipy.stats.studentized_range.sf ===")
+    print(table.to_string(index=False, formatters={'max_abs_err': '{:.1e}'.format, 'max_rel_err': '{:.1e}'.format}))
+    failed |= not table['ok'].all()
+
+    print("\n=== pairwise_posthoc p-values vs scipy (max abs difference) ===")
+    for method, err in check_pairwise().items():
+        ok = err <= SF_ATOL
+        failed |= not ok
+        print(f"{method:<14} {err:.1e}  {'ok' if ok else 'FAIL'}")
+
+    print("\n=== adjust_pvalues vs reference (max abs difference) ===")
+    for method, err in check_corrections().items():
+        ok = err <= 1e-12
+        failed |= not ok
+        print(f"{method:<14} {err:.1e}  {'ok' if ok else 'FAIL'}")
+
+    print(f"\n{'FAILED' if failed else 'All checks passed'} in {time.perf_counter() - started:.1f}s")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,91 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# Projection variants published in the UN World Population Prospects
+UN_VARIANTS = ['Medium', 'Low', 'High', 'Constant fertility', 'Instant replacement',
+               'Zero migration', 'Constant mortality', 'No change', 'Momentum']
+
+# WHO regions first, so small synthetic sets still match config.WHO_AREAS_COORDINATES
+WHO_AREAS = ['WHO: African region (AFRO)', 'WHO: Americas (AMRO)', 'WHO: Eastern Mediterranean Region (EMRO)',
+             'WHO: European Region (EURO)', 'WHO: South-East Asia region (SEARO)',
+             'WHO: Western Pacific region (WPRO)', 'World']
+
+def synthetic_areas(n_areas):
+    """WHO region names followed by numbered synthetic countries."""
+    return (WHO_AREAS + [f'Country {i:04d}' for i in range(n_areas)])[:n_areas]
+
+def _write_undata(path, areas, years, variants, values):
+    """
+    Write one UNdata-format CSV (all fields quoted, newest year first, as in the real exports).
+    Args:
+        path    : str, output file path
+        areas   : list of area names
+        years   : list of years
+        variants: list of variant names
+        values  : np.ndarray of shape (areas, years, variants)
+    """
+    area_idx, year_idx, variant_idx = np.meshgrid(np.arange(len(areas)), np.arange(len(years))[::-1],
+                                                  np.arange(len(variants)), indexing='ij')
+    df = pd.DataFrame({
+        'Country or Area': np.asarray(areas, dtype=object)[area_idx.ravel()],
+        'Year(s)': np.asarray(years)[year_idx.ravel()],
+        'Variant': np.asarray(variants, dtype=object)[variant_idx.ravel()],
+        'Value': values[area_idx.ravel(), year_idx.ravel(), variant_idx.ravel()].round(4),
+    })
+    df.to_csv(path, index=False, quoting=1)
+
+def generate_undata(out_dir, n_areas=7, n_years=6, n_variants=1, start_year=2019, seed=0):
+    """
+    Generate synthetic life expectancy and population exports in UNdata format.
+    Args:
+        out_dir   : str, directory to write the six CSVs into
+        n_areas   : int, number of areas
+        n_years   : int, number of consecutive years starting at start_year
+        n_variants: int, number of projection variants (up to 9)
+        start_year: int, first year
+        seed      : int, RNG seed
+    Returns:
+        tuple: (dict gender -> life expectancy CSV path, dict gender -> population CSV path)
+    """
+    rng = np.random.default_rng(seed)
+    areas = synthetic_areas(n_areas)
+    years = list(range(start_year, start_year + n_years))
+    variants = UN_VARIANTS[:n_variants]
+    shape = (n_areas, n_years, n_variants)
+
+    # Life expectancy: area baseline + slow trend + variant offset + noise, females ~5 years above males
+    base = rng.normal(70, 7, size=(n_areas, 1, 1))
+    trend = 0.15 * np.arange(n_years)[None, :, None]
+    offset = np.linspace(-1, 1, n_variants)[None, None, :] * np.arange(n_years)[None, :, None] * 0.02
+    male = base - 2.5 + trend + offset + rng.normal(0, 0.4, size=shape)
+    female = base + 2.5 + trend + offset + rng.normal(0, 0.4, size=shape)
+
+    # Population (thousands): area size with growth, split roughly evenly by sex
+    size = rng.lognormal(9, 1.5, size=(n_areas, 1, 1))
+    growth = (1 + rng.normal(0.01, 0.005, size=(n_areas, 1, 1))) ** np.arange(n_years)[None, :, None]
+    pop_male = size * growth * rng.uniform(0.48, 0.52, size=shape)
+    pop_female = size * growth - pop_male
+    both = (male * pop_male + female * pop_female) / (pop_male + pop_female)
+
+    os.makedirs(out_dir, exist_ok=True)
+    life_paths = {g: os.path.join(out_dir, f'life_expectancy_{g}.csv') for g in ('both', 'male', 'female')}
+    pop_paths = {g: os.path.join(out_dir, f'population_{g}.csv') for g in ('both', 'male', 'female')}
+    for g, values in zip(('both', 'male', 'female'), (both, male, female)):
+        _write_undata(life_paths[g], areas, years, variants, values)
+    for g, values in zip(('both', 'male', 'female'), (pop_male + pop_female, pop_male, pop_female)):
+        _write_undata(pop_paths[g], areas, years, variants, values)
+    return life_paths, pop_paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic UNdata life expectancy and population exports")
+    parser.add_argument("out_dir")
+    parser.add_argument("--areas", type=int, default=7)
+    parser.add_argument("--years", type=int, default=6)
+    parser.add_argument("--variants", type=int, default=1, choices=range(1, len(UN_VARIANTS) + 1))
+    parser.add_argument("--start-year", type=int, default=2019)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_undata(args.out_dir, args.areas, args.years, args.variants, args.start_year, args.seed)
@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import itertools
+import subprocess
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg') # Headless rendering for the plot stages
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+from generate_undata import generate_undata, synthetic_areas
+from undata import read_undata_csv
+from data_processing import (build_area_year_index, calculate_mean_life_expectancy,
+                             calculate_population, calculate_weighted_life_expectancy, prepare_area_life_expectancy_df)
+from stats_utils import perform_ttest, perform_anova
+from visualisation import plot_global_life_expectancy, plot_area_life_expectancy, plot_animated_map, plot_heatmap
+
+COLOURS = ['#F4D0A2', '#A6C9F2', '#D3AED6']
+
+# Size grids (areas, years, variants)
+PRESETS = {
+    'quick': {'areas': [10, 50], 'years': [6, 30], 'variants': [1, 3]},
+    'full': {'areas': [10, 50, 300], 'years': [6, 50, 150], 'variants': [1, 9]},
+}
+
+def _stages(life_paths, pop_paths, areas, years, out_dir):
+    """
+    Pipeline stages in execution order as (name, callable) pairs.
+    Each callable takes the shared state dict and stores its output in it.
+    """
+    def read(state):
+        state['life_dfs'] = {g: read_undata_csv(p, variants='Medium') for g, p in life_paths.items()}
+        state['pop_dfs'] = {g: read_undata_csv(p, variants='Medium') for g, p in pop_paths.items()}
+
+    def index(state):
+        state['indexes'] = {g: build_area_year_index(df) for g, df in state['life_dfs'].items()}
+
+    def extract(state):
+        state['mean_area'] = calculate_mean_life_expectancy(state['life_dfs'], areas=areas, years=years)
+        state['pop_area'] = calculate_population(state['pop_dfs'], areas=areas, years=years)
+
+    def weighted(state):
+        state['global_life'] = calculate_weighted_life_expectancy(state['mean_area'], state['pop_area'])
+
+    def area_df(state):
+        state['area_df'] = prepare_area_life_expectancy_df(state['mean_area'])
+
+    def ttest(state):
+        perform_ttest(state['area_df'])
+
+    def anova(state):
+        perform_anova(state['area_df'])
+
+    def plot_global(state):
+        plot_global_life_expectancy(state['global_life'], COLOURS, out_dir)
+
+    def plot_area(state):
+        plot_area_life_expectancy(state['area_df'], COLOURS, areas, out_dir)
+
+    def plot_animated(state):
+        plot_animated_map(state['area_df'], out_dir)
+
+    def heatmap(state):
+        plot_heatmap(state['area_df'], out_dir)
+
+    return [('read', read), ('index', index), ('extract', extract), ('weighted', weighted), ('area_df', area_df),
+            ('ttest', ttest), ('anova', anova), ('plot_global', plot_global), ('plot_area', plot_area),
+            ('plot_animated', plot_animated), ('plot_heatmap', heatmap)]
+
+def _run_stages(stages, measure_memory):
+    """Run every stage once, returning name -> seconds (or tracemalloc peak MiB) or an error message."""
+    state, results = {}, {}
+    for name, stage in stages:
+        try:
+            if measure_memory:
+                tracemalloc.start()
+                stage(state)
+                results[name] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+            else:
+                start = time.perf_counter()
+                stage(state)
+                results[name] = time.perf_counter() - start
+        except Exception as e: # Record the failure and keep benchmarking the other stages
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            results[name] = f'error: {type(e).__name__}: {e}'
+    return results
+
+def benchmark_size(n_areas, n_years, n_variants, repeats=3, seed=0):
+    """
+    Time (best of `repeats`) and memory-profile each stage on one synthetic dataset.
+    Returns:
+        dict with the size, file size and per-stage 'seconds' and 'peak_mib'
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        life_paths, pop_paths = generate_undata(os.path.join(tmp, 'raw'), n_areas, n_years, n_variants, seed=seed)
+        areas = synthetic_areas(n_areas)
+        years = range(2019, 2019 + n_years)
+        stages = _stages(life_paths, pop_paths, areas, years, tmp)
+
+        runs = [_run_stages(stages, measure_memory=False) for _ in range(repeats)]
+        seconds = {}
+        for name, _ in stages:
+            values = [r[name] for r in runs]
+            seconds[name] = min(values) if all(isinstance(v, float) for v in values) else values[0]
+        peak_mib = _run_stages(stages, measure_memory=True)
+        csv_bytes = sum(os.path.getsize(p) for p in list(life_paths.values()) + list(pop_paths.values()))
+
+    return {'areas': n_areas, 'years': n_years, 'variants': n_variants, 'csv_bytes': csv_bytes,
+            'seconds': seconds, 'peak_mib': peak_mib}
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def compare(old_path, new_path):
+    """Print per-stage time ratios (new / old) for sizes present in both result files."""
+    with open(old_path) as f:
+        old = {(r['areas'], r['years'], r['variants']): r for r in json.load(f)['results']}
+    with open(new_path) as f:
+        new = json.load(f)['results']
+
+    print(f"{'size':<18} {'stage':<14} {'old s':>10} {'new s':>10} {'ratio':>7}")
+    for r in new:
+        size = (r['areas'], r['years'], r['variants'])
+        if size not in old:
+            continue
+        for stage, t in r['seconds'].items():
+            t_old = old[size]['seconds'].get(stage)
+            if isinstance(t, float) and isinstance(t_old, float):
+                print(f"{'x'.join(map(str, size)):<18} {stage:<14} {t_old:>10.4f} {t:>10.4f} {t / t_old:>7.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic UNdata exports")
+    parser.add_argument("--preset", choices=PRESETS, default="quick")
+    parser.add_argument("--areas", type=int, nargs="+", help="Override the preset's area counts")
+    parser.add_argument("--years", type=int, nargs="+", help="Override the preset's year counts")
+    parser.add_argument("--variants", type=int, nargs="+", help="Override the preset's variant counts")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="JSON results path (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    grid = PRESETS[args.preset]
+    sizes = itertools.product(args.areas or grid['areas'], args.years or grid['years'], args.variants or grid['variants'])
+    results = []
+    for n_areas, n_years, n_variants in sizes:
+        print(f"Benchmarking {n_areas} areas x {n_years} years x {n_variants} variants...")
+        results.append(benchmark_size(n_areas, n_years, n_variants, repeats=args.repeats))
+
+    commit = _git_commit()
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', f'{commit}.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'commit': commit, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                   'numpy': np.__version__, 'results': results}, f, indent=2)
+    print(f"Results written to {output}")
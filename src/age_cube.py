@@ -0,0 +1,183 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from config import GENDERS, CHUNKSIZE
+from area_table import AreaTable
+
+# On-disk axis order. Queries fix a variant and an age, so each (variant, age) block is one
+# contiguous area x gender x year array and a slice touches only that block's pages.
+AXES = ('variant', 'age', 'area', 'gender', 'year')
+
+# UNdata 'Sex' labels -> the gender names used across the pipeline
+SEX_LABELS = {'Both sexes': 'both', 'Male': 'male', 'Female': 'female'}
+
+def sidecar_path(path):
+    """Metadata sidecar of a cube file: cube.npy -> cube.json."""
+    return os.path.splitext(path)[0] + '.json'
+
+def create_age_cube(path, areas, genders, years, ages, variants, dtype='float32'):
+    """
+    Allocate a NaN-filled on-disk cube and write its metadata sidecar.
+    Args:
+        path    : str, cube file (.npy, opened with np.load(mmap_mode=...))
+        areas, genders, years, ages, variants: axis labels
+        dtype   : value dtype (float32 halves the file size of float64)
+    Returns:
+        AgeCube opened for writing
+    """
+    axes = {'variant': list(variants), 'age': [int(a) for a in ages], 'area': list(areas),
+            'gender': list(genders), 'year': [int(y) for y in years]}
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    data = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(len(axes[a]) for a in AXES))
+    for v in range(data.shape[0]): # Fill block by block so only one block of pages is dirty at a time
+        for a in range(data.shape[1]):
+            data[v, a] = np.nan
+        data.flush()
+    del data
+    with open(sidecar_path(path), 'w') as f:
+        json.dump({'axes': list(AXES), 'dtype': np.dtype(dtype).name, 'labels': axes}, f, indent=1)
+    return AgeCube(path, mode='r+')
+
+class AgeCube:
+    """
+    Memory-mapped life expectancy by variant x age x area x gender x year (see AXES), with
+    axis labels in a JSON sidecar. Nothing is read until a slice is materialised, and then
+    only the pages of that slice.
+    """
+
+    def __init__(self, path, mode='r'):
+        with open(sidecar_path(path)) as f:
+            meta = json.load(f)
+        if meta['axes'] != list(AXES):
+            raise ValueError(f'{path}: unsupported axis order {meta["axes"]}')
+        labels = meta['labels']
+        self.path = path
+        self.variants, self.ages, self.areas = labels['variant'], labels['age'], labels['area']
+        self.genders, self.years = labels['gender'], labels['year']
+        self.data = np.load(path, mmap_mode=mode) # Header read only; values stay on disk
+        expected = tuple(len(labels[a]) for a in AXES)
+        if self.data.shape != expected:
+            raise ValueError(f'{path}: shape {self.data.shape} does not match its sidecar {expected}')
+
+    def __repr__(self):
+        return (f'AgeCube({len(self.variants)} variants, {len(self.ages)} ages, {len(self.areas)} areas, '
+                f'{len(self.genders)} genders, {len(self.years)} years)')
+
+    @property
+    def nbytes(self):
+        """Size of the values on disk."""
+        return self.data.nbytes
+
+    def slice(self, variant='Medium', age=0):
+        """Lazy area x gender x year view of one variant and age (see AgeSlice)."""
+        if variant not in self.variants:
+            raise KeyError(f"Variant {variant!r} not in cube ({', '.join(self.variants)})")
+        if int(age) not in self.ages:
+            raise KeyError(f'Age {age} not in cube ({self.ages[0]}-{self.ages[-1]})')
+        return AgeSlice(self, self.variants.index(variant), self.ages.index(int(age)))
+
+    def write_block(self, variant, age, values):
+        """Write the (areas, genders, years) block of one variant and age."""
+        self.data[self.variants.index(variant), self.ages.index(int(age))] = values
+
+    def flush(self):
+        self.data.flush()
+
+class AgeSlice:
+    """
+    One (variant, age) block of an AgeCube, read on demand.
+    Provides the to_cube/to_frame interface of AreaTable, so build_cube (and with it
+    calculate_weighted_life_expectancy) and prepare_area_life_expectancy_df read it directly.
+    """
+
+    def __init__(self, cube, variant_pos, age_pos):
+        self.cube = cube
+        self.variant = cube.variants[variant_pos]
+        self.age = cube.ages[age_pos]
+        self._block = cube.data[variant_pos, age_pos] # Still a memmap view: no data read yet
+
+    @property
+    def areas(self):
+        return self.cube.areas
+
+    @property
+    def genders(self):
+        return self.cube.genders
+
+    def to_cube(self, areas=None, genders=None, years=None):
+        """
+        Read the requested cells into a dense float64 array; only their pages are touched.
+        Returns:
+            tuple: (np.ndarray of shape (areas, genders, years) with NaN for missing values, areas, years)
+        """
+        areas = self.cube.areas if areas is None else list(areas)
+        genders = self.cube.genders if genders is None else list(genders)
+        years = self.cube.years if years is None else list(years)
+        index = [pd.Index(labels).get_indexer(wanted) for labels, wanted in
+                 ((self.cube.areas, areas), (self.cube.genders, genders), (self.cube.years, years))]
+        out = np.full((len(areas), len(genders), len(years)), np.nan)
+        found = [np.flatnonzero(i >= 0) for i in index] # Labels missing from the cube stay NaN
+        out[np.ix_(*found)] = self._block[np.ix_(*(i[f] for i, f in zip(index, found)))]
+        return out, areas, years
+
+    def to_frame(self, value_name='life_expectancy'):
+        """Long DataFrame of the slice's non-missing cells, in AreaTable row order (area, gender, year)."""
+        return self.to_area_table().to_frame(value_name)
+
+    def to_area_table(self, areas=None, years=None):
+        """Materialise the slice (optionally only some areas and years) as an AreaTable (small: one age and variant)."""
+        values, areas, years = self.to_cube(areas=areas, years=years)
+        a, g, y = np.nonzero(~np.isnan(values))
+        return AreaTable(areas, self.cube.genders, a, g, np.asarray(years)[y], values[a, g, y])
+
+def read_age_slice(path, variant='Medium', age=0, areas=None, years=None):
+    """Life expectancy at one age and variant from an age cube file, as an AreaTable (None keeps every area/year)."""
+    return AgeCube(path).slice(variant, age).to_area_table(areas=areas, years=years)
+
+def build_age_cube(files, path, chunksize=CHUNKSIZE, dtype='float32', age_column='Age'):
+    """
+    Build an age cube from UNdata age-specific exports in two streaming passes: the first
+    collects the axis labels, the second scatters each chunk into the memory-mapped file.
+    Peak memory is one chunk plus the labels, however large the cube.
+    Args:
+        files     : dict gender -> CSV path with columns ['Country or Area', 'Year(s)', 'Variant', age_column, 'Value'],
+                    or a single CSV path with a 'Sex' column ('Both sexes', 'Male', 'Female')
+        path      : str, cube file to write (.npy) next to its .json sidecar
+        chunksize : int, rows parsed per chunk
+        dtype     : value dtype of the cube
+        age_column: column holding the exact age (e.g. '0', '65', '100+')
+    Returns:
+        AgeCube opened for reading
+    """
+    sources = files.items() if isinstance(files, dict) else [(None, files)]
+    columns = ['Country or Area', 'Year(s)', 'Variant', age_column, 'Value']
+
+    def chunks():
+        for gender, csv in sources:
+            usecols = columns if gender is not None else columns + ['Sex']
+            for chunk in pd.read_csv(csv, usecols=usecols, dtype=str, chunksize=chunksize):
+                year = pd.to_numeric(chunk['Year(s)'], errors='coerce')
+                age = pd.to_numeric(chunk[age_column].str.extract(r'(\d+)', expand=False), errors='coerce')
+                keep = year.notna() & age.notna() # Drops footnote rows
+                sex = chunk['Sex'].replace(SEX_LABELS) if gender is None else gender
+                yield pd.DataFrame({'area': chunk['Country or Area'], 'gender': sex, 'year': year, 'age': age,
+                                    'variant': chunk['Variant'], 'value': pd.to_numeric(chunk['Value'], errors='coerce')})[keep]
+
+    labels = {axis: {} for axis in AXES} # Ordered sets of labels
+    for chunk in chunks():
+        for axis in AXES:
+            labels[axis].update(dict.fromkeys(chunk[axis].unique().tolist()))
+    genders = [g for g in GENDERS if g in labels['gender']] + [g for g in labels['gender'] if g not in GENDERS]
+    cube = create_age_cube(path, list(labels['area']), genders, sorted(int(y) for y in labels['year']),
+                           sorted(int(a) for a in labels['age']), list(labels['variant']), dtype=dtype)
+
+    axis_index = {'variant': cube.variants, 'age': cube.ages, 'area': cube.areas, 'gender': cube.genders,
+                  'year': cube.years}
+    for chunk in chunks():
+        codes = tuple(pd.Index(axis_index[axis]).get_indexer(chunk[axis].astype(int) if axis in ('year', 'age')
+                                                             else chunk[axis]) for axis in AXES)
+        cube.data[codes] = chunk['value'].to_numpy()
+    cube.flush()
+    return AgeCube(path)
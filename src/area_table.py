@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+class AreaTable:
+    """
+    Compact area x gender x year values backed by contiguous arrays instead of nested dicts.
+    Rows are sorted by area, then gender, then year: area and gender are categorical codes
+    into `areas`/`genders`, years are int16 and values float64.
+
+    The read-only mapping interface of the nested dicts is kept: `table[area]` (or `.get`,
+    `.items()`) materialises that area's gender -> year -> value dict on demand, and
+    iteration, `len`, `in` and `.keys()` cover the areas. Every requested area is present,
+    with empty year dicts when the data has no rows for it.
+    """
+    __slots__ = ('areas', 'genders', 'area_codes', 'gender_codes', 'years', 'values', '_area_pos', '_offsets')
+
+    def __init__(self, areas, genders, area_codes, gender_codes, years, values):
+        self.areas = list(areas)
+        self.genders = list(genders)
+        order = np.lexsort((years, gender_codes, area_codes)) # Row order the nested dicts iterate in
+        self.area_codes = np.asarray(area_codes, dtype=np.int32)[order]
+        self.gender_codes = np.asarray(gender_codes, dtype=np.int8)[order]
+        self.years = np.asarray(years, dtype=np.int16)[order]
+        self.values = np.asarray(values, dtype=np.float64)[order]
+        self._area_pos = {area: i for i, area in enumerate(self.areas)}
+        self._offsets = np.searchsorted(self.area_codes, np.arange(len(self.areas) + 1)) # Row span of each area
+
+    @classmethod
+    def from_frames(cls, dfs, areas, years):
+        """
+        Build the table from raw UNdata DataFrames in one vectorized pass per gender.
+        The first row wins for duplicated (area, year) keys, as in build_area_year_index.
+        Args:
+            dfs  : dict of gender -> DataFrame with UNdata columns
+            areas: list of areas to keep (all become keys, even without rows)
+            years: iterable of years to keep
+        Returns:
+            AreaTable
+        """
+        area_index, year_index = pd.Index(list(areas)), pd.Index(list(years))
+        parts = [(np.empty(0, int), np.empty(0, int), np.empty(0, int), np.empty(0))]
+        for j, df in enumerate(dfs.values()):
+            first = df.drop_duplicates(subset=['Country or Area', 'Year(s)'])
+            a = area_index.get_indexer(first['Country or Area'])
+            y = year_index.get_indexer(first['Year(s)'])
+            keep = (a >= 0) & (y >= 0)
+            parts.append((a[keep], np.full(keep.sum(), j), year_index.to_numpy()[y[keep]],
+                          first['Value'].to_numpy(dtype=float)[keep]))
+        area_codes, gender_codes, table_years, values = (np.concatenate(p) for p in zip(*parts))
+        return cls(area_index, list(dfs), area_codes, gender_codes, table_years, values)
+
+    def __len__(self):
+        return len(self.areas)
+
+    def __iter__(self):
+        return iter(self.areas)
+
+    def __contains__(self, area):
+        return area in self._area_pos
+
+    def __getitem__(self, area):
+        i = self._area_pos[area]
+        lo, hi = self._offsets[i], self._offsets[i + 1]
+        nested = {g: {} for g in self.genders}
+        for g, year, value in zip(self.gender_codes[lo:hi].tolist(), self.years[lo:hi].tolist(),
+                                  self.values[lo:hi].tolist()):
+            nested[self.genders[g]][year] = value
+        return nested
+
+    def __repr__(self):
+        return f'AreaTable({len(self.areas)} areas, {len(self.genders)} genders, {len(self.values)} values)'
+
+    def get(self, area, default=None):
+        return self[area] if area in self._area_pos else default
+
+    def keys(self):
+        return list(self.areas)
+
+    def items(self):
+        return ((area, self[area]) for area in self.areas)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column arrays."""
+        return sum(a.nbytes for a in (self.area_codes, self.gender_codes, self.years, self.values))
+
+    def to_frame(self, value_name='life_expectancy'):
+        """
+        Long DataFrame view; the year and value columns share memory with the table.
+        Returns:
+            pd.DataFrame with columns ['area', 'year', 'gender', value_name] (area and gender categorical)
+        """
+        return pd.DataFrame({
+            'area': pd.Categorical.from_codes(self.area_codes, categories=self.areas),
+            'year': self.years,
+            'gender': pd.Categorical.from_codes(self.gender_codes, categories=self.genders),
+            value_name: self.values,
+        }, copy=False)
+
+    def to_cube(self, areas=None, genders=None, years=None):
+        """
+        Scatter the values into a dense array (see data_processing.build_cube).
+        Returns:
+            tuple: (np.ndarray of shape (areas, genders, years) with NaN for missing values, areas, years)
+        """
+        areas = self.areas if areas is None else list(areas)
+        genders = self.genders if genders is None else list(genders)
+        a = pd.Index(areas).get_indexer(pd.Index(self.areas))[self.area_codes] # Table code -> requested row
+        g = pd.Index(genders).get_indexer(pd.Index(self.genders))[self.gender_codes]
+        selected = (a >= 0) & (g >= 0)
+        if years is None:
+            years = np.unique(self.years[selected]).tolist()
+        y = pd.Index(list(years)).get_indexer(self.years)
+        keep = selected & (y >= 0)
+        cube = np.full((len(areas), len(genders), len(years)), np.nan)
+        cube[a[keep], g[keep], y[keep]] = self.values[keep]
+        return cube, list(areas), list(years)
@@ -0,0 +1,116 @@
+import os
+import re
+import json
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from config import COLOURS, OUTPUT_DIR
+from data_processing import (read_life_expectancy_data, calculate_mean_life_expectancy, calculate_population,
+                             calculate_weighted_life_expectancy, prepare_area_life_expectancy_df)
+
+_variant_data = {} # Per-worker copy of the indexed data, set once by _init_worker
+
+def build_scenarios(variants, genders, plots, windows):
+    """
+    Expand the scenario matrix.
+    The global plot always draws every gender, so 'global' scenarios have no gender axis
+    (gender None, id '<variant>_global_<window>') instead of one identical render per gender.
+    Args:
+        variants: list of UN projection variants
+        genders : list of genders
+        plots   : list of plot types ('global', 'area', 'animated', 'heatmap')
+        windows : list of (start, end) year windows
+    Returns:
+        list of scenario dicts with an 'id' usable as a directory name
+    """
+    scenarios = []
+    for variant, plot, (start, end) in itertools.product(variants, plots, windows):
+        for gender in ([None] if plot == 'global' else genders):
+            label = '_'.join(part for part in (variant, gender, plot, f'{start}-{end}') if part is not None)
+            scenarios.append({'id': re.sub(r'[^A-Za-z0-9_-]+', '-', label), 'variant': variant, 'gender': gender,
+                              'plot': plot, 'start': start, 'end': end})
+    return scenarios
+
+def load_variant_data(variants, use_cache=True):
+    """
+    Load every area and year of the raw data once and index it per variant.
+    Returns:
+        dict: variant -> (mean_area, pop_area), or None for variants missing from the data
+    """
+    life_dfs, pop_dfs = read_life_expectancy_data(use_cache=use_cache, variants=variants)
+    data = {}
+    for variant in variants:
+        life = {g: df[df['Variant'] == variant] for g, df in life_dfs.items()}
+        pop = {g: df[df['Variant'] == variant] for g, df in pop_dfs.items()}
+        if all(df.empty for df in life.values()):
+            data[variant] = None
+            continue
+        data[variant] = (calculate_mean_life_expectancy(life), calculate_population(pop)) # Every area and year
+    return data
+
+def _init_worker(variant_data):
+    """Receive the indexed data once per worker process instead of once per scenario."""
+    _variant_data.update(variant_data)
+
+def run_scenario(scenario, output_root):
+    """
+    Render one scenario into its own subdirectory of output_root.
+    Returns:
+        dict: the scenario with its output directory, files, duration and status
+    """
+    from visualisation import plot_global_life_expectancy, plot_area_life_expectancy, plot_animated_map, plot_heatmap
+
+    started = time.perf_counter()
+    out_dir = os.path.join(output_root, scenario['id'])
+    record = dict(scenario, output_dir=out_dir)
+    try:
+        if _variant_data[scenario['variant']] is None:
+            raise ValueError(f"No rows for variant '{scenario['variant']}' in data/raw")
+        os.makedirs(out_dir, exist_ok=True) # Only once the scenario is valid, so failures leave no empty directory
+        mean_area, pop_area = _variant_data[scenario['variant']]
+        years = range(scenario['start'], scenario['end'] + 1)
+        if scenario['plot'] == 'global':
+            plot_global_life_expectancy(calculate_weighted_life_expectancy(mean_area, pop_area, years=years),
+                                        COLOURS, out_dir)
+        else:
+            area_df = prepare_area_life_expectancy_df(mean_area)
+            areas = area_df['area'].unique().tolist()
+            area_df = area_df[area_df['year'].isin(years)]
+            if scenario['gender'] != 'both':
+                area_df = area_df[area_df['gender'] == scenario['gender']]
+            if scenario['plot'] == 'area':
+                plot_area_life_expectancy(area_df, COLOURS, areas, out_dir)
+            elif scenario['plot'] == 'heatmap':
+                plot_heatmap(area_df, out_dir)
+            else:
+                plot_animated_map(area_df, out_dir)
+        record['status'] = 'ok'
+    except Exception as e: # Record the failure and let the other scenarios finish
+        record['status'] = f'error: {type(e).__name__}: {e}'
+    record['files'] = sorted(os.listdir(out_dir)) if os.path.isdir(out_dir) else []
+    record['seconds'] = time.perf_counter() - started
+    return record
+
+def run_batch(scenarios, output_root=OUTPUT_DIR, use_cache=True, workers=None):
+    """
+    Load and index the data once, run every scenario across a worker pool and write a manifest.
+    Args:
+        scenarios  : list of scenario dicts from build_scenarios
+        output_root: str, directory receiving one subdirectory per scenario
+        use_cache  : bool, use the binary CSV cache when loading
+        workers    : int, worker processes (None for all cores)
+    Returns:
+        dict: the manifest written to <output_root>/batch_manifest.json
+    """
+    started = time.perf_counter()
+    variant_data = load_variant_data(sorted({s['variant'] for s in scenarios}), use_cache=use_cache)
+    load_seconds = time.perf_counter() - started
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(variant_data,)) as pool:
+        records = list(pool.map(run_scenario, scenarios, itertools.repeat(output_root)))
+
+    manifest = {'load_seconds': load_seconds, 'total_seconds': time.perf_counter() - started, 'scenarios': records}
+    os.makedirs(output_root, exist_ok=True)
+    with open(os.path.join(output_root, 'batch_manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
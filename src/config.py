@@ -1,3 +1,33 @@
+import os
+
+# Repository root, so data paths resolve the same from any working directory
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Directory receiving plots, profiles, data summaries and batch runs (LIFE_EXPECTANCY_OUTPUT_DIR overrides it)
+OUTPUT_DIR = os.environ.get('LIFE_EXPECTANCY_OUTPUT_DIR') or os.path.join(ROOT_DIR, 'data', 'output')
+
+# Directory for cached binary copies of the raw CSVs
+CACHE_DIR = os.path.join(ROOT_DIR, 'data', 'cache')
+
+# Manifest mapping each (metric, gender) series to its data source (CSV, zip archive or SQLite database)
+SOURCES_MANIFEST = os.path.join(ROOT_DIR, 'data', 'sources.json')
+
+# Default analysis window and gender order used across the pipeline
+YEARS = range(2019, 2025)
+GENDERS = ['both', 'male', 'female']
+COLOURS = ['#F4D0A2', '#A6C9F2', '#D3AED6'] # Plot colour per gender, in GENDERS order
+
+# UN projection variant analysed by default and rows parsed per chunk when streaming exports
+VARIANT = 'Medium'
+CHUNKSIZE = 200_000
+
+# Region registry (area -> parent, optional lat/lon) used for hierarchical roll-ups
+REGION_HIERARCHY_FILE = os.path.join(ROOT_DIR, 'data', 'mapping', 'region_hierarchy.csv')
+
+# Local copy of plotly's world base map (https://cdn.plot.ly/world_110m.json). plotly.js fetches it
+# from the CDN when the map is viewed, so the 'geo' animation is only offline when this file exists
+TOPOJSON_FILE = os.path.join(ROOT_DIR, 'data', 'topojson', 'world_110m.json')
+
 # WHO region coordinates for bubble map
 WHO_AREAS_COORDINATES = {
     'WHO: African region (AFRO)': {'lat': 1.0, 'lon': 20.0},
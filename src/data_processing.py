@@ -1,87 +1,290 @@
 import pandas as pd
 import numpy as np
-from config import WHO_AREAS_COORDINATES
-
-def read_life_expectancy_data():
-    """Load life expectancy and population CSVs."""
-    life_expectancy = {
-        'both': pd.read_csv('data/raw/UNdata_Export_20250106_135531463.csv'),
-        'male': pd.read_csv('data/raw/UNdata_Export_20250106_135951253.csv'),
-        'female': pd.read_csv('data/raw/UNdata_Export_20250106_140234264.csv'),
-    }
-    population = {
-        'both': pd.read_csv('data/raw/UNdata_Export_20250217_214426488.csv'),
-        'male': pd.read_csv('data/raw/UNdata_Export_20250217_214612681.csv'),
-        'female': pd.read_csv('data/raw/UNdata_Export_20250217_214748417.csv'),
-    }
+from config import SOURCES_MANIFEST, YEARS, GENDERS, VARIANT
+from area_table import AreaTable
+from data_sources import load_manifest, read_source
+
+def read_life_expectancy_data(use_cache=True, areas=None, years=None, variants=VARIANT, manifest=SOURCES_MANIFEST):
+    """
+    Load the life expectancy and population series listed in a data-source manifest, filtered while reading.
+    Args:
+        use_cache: bool, if False re-parse CSV and zip sources instead of using the binary cache
+        areas    : areas to keep, None for all
+        years    : years to keep, None for all
+        variants : UN projection variant(s) to keep, None for all
+        manifest : str, data-source manifest (see data_sources.load_manifest)
+    Returns:
+        tuple: (dict gender -> life expectancy DataFrame, dict gender -> population DataFrame)
+    """
+    sources = load_manifest(manifest)
+    filters = {'use_cache': use_cache, 'areas': areas, 'years': years, 'variants': variants}
+    life_expectancy = {g: read_source(source, **filters) for g, source in sources['life_expectancy'].items()}
+    population = {g: read_source(source, **filters) for g, source in sources['population'].items()}
     return life_expectancy, population
 
-def extract_values(df, area):
-    """""
-    Extract life expectancy or population values for a specific area from 2019 to 2024.
+def build_area_year_index(df):
+    """
+    Build an area -> year -> value lookup from a raw UNdata DataFrame in one pass.
+    The first row wins for duplicated (area, year) keys, as in the original scan.
     Args:
         df: DataFrame containing the raw data
-        area: str, area name (e.g., WHO region)
     Returns:
-        dict: year -> value
+        dict: area -> year -> value
     """
-    return {year: df[(df['Country or Area']==area) & (df['Year(s)']==year)]['Value'].values[0]
-            for year in range(2019, 2025) if not df[(df['Country or Area']==area) & (df['Year(s)']==year)].empty}
+    first = df.drop_duplicates(subset=['Country or Area', 'Year(s)'])
+    index = {}
+    for area, year, value in zip(first['Country or Area'].tolist(), first['Year(s)'].tolist(), first['Value'].to_numpy()):
+        index.setdefault(area, {})[year] = value
+    return index
 
-def calculate_mean_life_expectancy(life_dfs):
+def extract_values(df, area, years=YEARS):
     """
     Extract life expectancy or population values for a specific area from 2019 to 2024.
     Args:
-        df: DataFrame containing the raw data
-        area: str, area name (e.g., WHO region)
+        df   : DataFrame containing the raw data, or an index from build_area_year_index
+        area : str, area name (e.g., WHO region)
+        years: iterable of years to extract
     Returns:
         dict: year -> value
     """
-    return {area: {g: extract_values(df, area) for g, df in life_dfs.items()} for area in WHO_AREAS_COORDINATES.keys()}
+    index = df if isinstance(df, dict) else build_area_year_index(df)
+    area_values = index.get(area, {})
+    return {year: area_values[year] for year in years if year in area_values}
+
+def frame_areas_years(dfs):
+    """
+    Areas (in first-seen order) and sorted years present in a dict of raw UNdata DataFrames.
+    Args:
+        dfs: dict of gender -> DataFrame with UNdata columns
+    Returns:
+        tuple: (list of areas, list of years)
+    """
+    frames = list(dfs.values())
+    areas = pd.unique(pd.concat([df['Country or Area'] for df in frames])).tolist() if frames else []
+    years = sorted(set().union(*(df['Year(s)'].unique().tolist() for df in frames)))
+    return areas, years
 
-def calculate_population(pop_dfs):
+def calculate_mean_life_expectancy(life_dfs, areas=None, years=None):
+    """
+    Calculate mean life expectancy by area and gender.
+    Args:
+        life_dfs: dict of DataFrames for each gender
+        areas   : list of areas, defaults to every area in the data
+        years   : iterable of years to extract, defaults to every year in the data
+    Returns:
+        AreaTable: area -> gender -> year -> life expectancy
+    """
+    data_areas, data_years = frame_areas_years(life_dfs)
+    return AreaTable.from_frames(life_dfs, data_areas if areas is None else areas,
+                                 data_years if years is None else years)
+
+def calculate_population(pop_dfs, areas=None, years=None):
     """
     Calculate population by area and gender.
     Args:
         pop_dfs: dict of DataFrames for each gender
+        areas  : list of areas, defaults to every area in the data
+        years  : iterable of years to extract, defaults to every year in the data
+    Returns:
+        AreaTable: area -> gender -> year -> population
+    """
+    data_areas, data_years = frame_areas_years(pop_dfs)
+    return AreaTable.from_frames(pop_dfs, data_areas if areas is None else areas,
+                                 data_years if years is None else years)
+
+def build_cube(nested, areas=None, genders=GENDERS, years=None):
+    """
+    Align a nested area -> gender -> year dict into a dense array.
+    Args:
+        nested : AreaTable, age_cube.AgeSlice or dict of area -> gender -> year -> value
+        areas  : list of areas (rows), defaults to the dict order
+        genders: list of genders (middle axis)
+        years  : list of years (last axis), defaults to every year present
+    Returns:
+        tuple: (np.ndarray of shape (areas, genders, years) with NaN for missing values, areas, years)
+    """
+    if hasattr(nested, 'to_cube'): # AreaTable scatters its columns; an AgeSlice reads only these cells from disk
+        return nested.to_cube(areas=areas, genders=genders, years=years)
+    areas = list(nested.keys()) if areas is None else list(areas)
+    if years is None:
+        years = sorted({y for area in areas for g in genders for y in nested.get(area, {}).get(g, {})})
+    cube = np.full((len(areas), len(genders), len(years)), np.nan)
+    year_pos = {y: k for k, y in enumerate(years)}
+    for i, area in enumerate(areas):
+        for j, g in enumerate(genders):
+            for year, val in nested.get(area, {}).get(g, {}).items():
+                if year in year_pos:
+                    cube[i, j, year_pos[year]] = val
+    return cube, areas, list(years)
+
+def build_presence(nested, areas, genders=GENDERS, years=None):
+    """
+    Mask of the cells that have a row, even one with a missing value, aligned like build_cube.
+    Args:
+        nested : AreaTable, age_cube.AgeSlice or dict of area -> gender -> year -> value
+        areas  : list of areas (rows)
+        genders: list of genders (middle axis)
+        years  : list of years (last axis)
     Returns:
-        dict: area -> gender -> year -> population
+        np.ndarray of bool, shape (areas, genders, years)
     """
-    return {area: {g: extract_values(df, area) for g, df in pop_dfs.items()} for area in WHO_AREAS_COORDINATES.keys()}
+    if isinstance(nested, AreaTable): # Scatter a marker per row, so NaN-valued rows still count as present
+        nested = AreaTable(nested.areas, nested.genders, nested.area_codes, nested.gender_codes, nested.years,
+                           np.ones(len(nested.values)))
+    if hasattr(nested, 'to_cube'): # An AgeSlice has no rows: a missing value is a missing cell
+        return ~np.isnan(nested.to_cube(areas=areas, genders=genders, years=years)[0])
+    year_pos = {y: k for k, y in enumerate(years)}
+    present = np.zeros((len(areas), len(genders), len(years)), dtype=bool)
+    for i, area in enumerate(areas):
+        for j, g in enumerate(genders):
+            for year in nested.get(area, {}).get(g, {}):
+                if year in year_pos:
+                    present[i, j, year_pos[year]] = True
+    return present
 
-def calculate_weighted_life_expectancy(mean_area, pop_area):
+def weighted_mean(life, pop, axis=0, present=None):
+    """
+    Population-weighted mean of aligned life expectancy and population arrays, with the
+    np.nansum semantics of the original per-year loop: over the present cells, missing
+    products drop out of the numerator and missing populations out of the denominator.
+    A present cell with a missing life expectancy therefore still adds its population to
+    the denominator, and a group with no present cells is NaN.
+    Args:
+        life   : np.ndarray of life expectancy
+        pop    : np.ndarray of population, same shape as life
+        axis   : int or tuple of ints to reduce over
+        present: optional bool array of the cells that have a row (see build_presence);
+                 defaults to the cells with a life expectancy value
+    Returns:
+        np.ndarray: weighted means
+    """
+    present = ~np.isnan(life) if present is None else present
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weighted = (np.nansum(np.where(present, life * pop, np.nan), axis=axis)
+                    / np.nansum(np.where(present, pop, np.nan), axis=axis))
+    return np.where(present.any(axis=axis), weighted, np.nan)
+
+def group_weighted_mean(life, pop, group_codes, n_groups=None):
+    """
+    Population-weighted mean per area group in one pass over the area axis.
+    Args:
+        life       : np.ndarray of shape (areas, ...)
+        pop        : np.ndarray of the same shape
+        group_codes: array of int group codes, one per area
+        n_groups   : number of groups, defaults to max code + 1
+    Returns:
+        np.ndarray of shape (groups, ...)
+    """
+    group_codes = np.asarray(group_codes)
+    n_groups = group_codes.max() + 1 if n_groups is None else n_groups
+    membership = (group_codes[None, :] == np.arange(n_groups)[:, None]).astype(float) # (groups, areas)
+    present = ~np.isnan(life)
+    numerator = np.tensordot(membership, np.nan_to_num(life * pop), axes=1)
+    denominator = np.tensordot(membership, np.nan_to_num(np.where(present, pop, 0.0)), axes=1)
+    counts = np.tensordot(membership, present.astype(float), axes=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, numerator / denominator, np.nan)
+
+def year_range_weighted_mean(life, pop, years, start, end):
+    """
+    Population-weighted mean per gender pooled over all areas and years in [start, end].
+    Args:
+        life, pop : np.ndarray of shape (areas, genders, years)
+        years     : list of years matching the last axis
+        start, end: inclusive year range
+    Returns:
+        np.ndarray of shape (genders,)
+    """
+    years = np.asarray(years)
+    selected = (years >= start) & (years <= end)
+    return weighted_mean(life[..., selected], pop[..., selected], axis=(0, 2))
+
+def parse_window(text):
+    """Parse a 'start-end' (or single 'year') window into an inclusive (start, end) tuple; ValueError if reversed."""
+    start, _, end = text.partition('-')
+    start, end = int(start), int(end or start)
+    if start > end:
+        raise ValueError(f"Window '{text}' ends before it starts")
+    return start, end
+
+def window_years(windows):
+    """Sorted years covered by a list of inclusive (start, end) windows."""
+    return sorted({year for start, end in windows for year in range(start, end + 1)})
+
+def build_prefix_sums(cube, years):
+    """
+    Cumulative count, sum and sum of squares along the year axis, so the moments of any
+    year window come from two lookups instead of a pass over the window.
+    Values are shifted by the cube's overall mean before squaring, which keeps the
+    sum-of-squares differences accurate; shared by every cell, so prefixes can be summed across areas.
+    Args:
+        cube : np.ndarray of shape (..., years) with NaN for missing values
+        years: list of years matching the last axis
+    Returns:
+        dict with 'years', 'shift' and the (..., years + 1) arrays 'n', 'sum', 'sumsq' (leading zero)
+    """
+    present = ~np.isnan(cube)
+    shift = float(np.nanmean(cube)) if present.any() else 0.0
+    x = np.where(present, cube - shift, 0.0)
+    pad = [(0, 0)] * (cube.ndim - 1) + [(1, 0)]
+    return {
+        'years': np.asarray(years),
+        'shift': shift,
+        'n': np.pad(np.cumsum(present, axis=-1), pad),
+        'sum': np.pad(np.cumsum(x, axis=-1), pad),
+        'sumsq': np.pad(np.cumsum(x * x, axis=-1), pad),
+    }
+
+def window_moments(prefix, start, end):
+    """
+    Count, mean and sample variance of the values in the inclusive year window [start, end].
+    Args:
+        prefix    : dict from build_prefix_sums
+        start, end: inclusive year range
+    Returns:
+        tuple of np.ndarray (n, mean, var); mean is NaN without values and var below two values
+    """
+    lo = np.searchsorted(prefix['years'], start, side='left')
+    hi = np.searchsorted(prefix['years'], end, side='right')
+    n = prefix['n'][..., hi] - prefix['n'][..., lo]
+    s = prefix['sum'][..., hi] - prefix['sum'][..., lo]
+    ss = prefix['sumsq'][..., hi] - prefix['sumsq'][..., lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(n > 0, s / n, np.nan)
+        var = np.where(n > 1, np.maximum(ss - s * mean, 0.0) / (n - 1), np.nan)
+    return n, mean + prefix['shift'], var
+
+def calculate_weighted_life_expectancy(mean_area, pop_area, years=None):
     """
     Compute global weighted life expectancy by weighting each area's life expectancy
     by its population.
     Args:
-        mean_area: dict of area -> gender -> year -> life expectancy
-        pop_area: dict of area -> gender -> year -> population
+        mean_area: AreaTable, age_cube.AgeSlice or dict of area -> gender -> year -> life expectancy
+        pop_area : AreaTable or dict of area -> gender -> year -> population
+        years    : list of years to report, defaults to every year in mean_area
     Returns:
-        dict: year -> gender -> weighted global life expectancy
-    """
-    global_data = {'year': list(range(2019,2025)), 'both':[], 'male':[], 'female':[]}
-    for year in range(2019,2025):
-        for g in ['both','male','female']:
-            life_values, pop_values = [], []
-            for area in mean_area.keys():
-                if year in mean_area[area][g]:
-                    life_values.append(mean_area[area][g][year])
-                    pop_values.append(pop_area[area][g][year])
-            if pop_values:
-                weighted = np.nansum(np.array(life_values)*np.array(pop_values))/np.nansum(pop_values)
-            else:
-                weighted = np.nan
-            global_data[g].append(weighted)
+        dict: 'year' -> list of years, gender -> list of weighted global life expectancy
+    """
+    life, areas, years = build_cube(mean_area, years=years)
+    pop, _, _ = build_cube(pop_area, areas=areas, years=years)
+    present = build_presence(mean_area, areas, years=years) # Rows with a NaN value still weigh in, as before
+    weighted = weighted_mean(life, pop, axis=0, present=present) # (genders, years)
+
+    global_data = {'year': list(years)}
+    for j, g in enumerate(GENDERS):
+        global_data[g] = list(weighted[j])
     return global_data
 
 def prepare_area_life_expectancy_df(mean_area):
     """
     Flatten nested mean_area dict to a DataFrame suitable for plotting.
     Args:
-        mean_area: dict of area -> gender -> year -> life expectancy
+        mean_area: AreaTable, age_cube.AgeSlice or dict of area -> gender -> year -> life expectancy
     Returns:
         pd.DataFrame with columns ['area', 'year', 'gender', 'life_expectancy']
     """
+    if hasattr(mean_area, 'to_frame'):
+        return mean_area.to_frame() # AreaTable columns are views of its arrays; an AgeSlice reads one block
     records = []
     for area, gender_dict in mean_area.items():
         for gender, year_dict in gender_dict.items():
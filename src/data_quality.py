@@ -0,0 +1,232 @@
+import json
+import numpy as np
+import pandas as pd
+from config import CHUNKSIZE, SOURCES_MANIFEST
+from undata import UNDATA_COLUMNS
+from data_sources import load_manifest, open_source_csv
+
+def _merge_moments(a, b):
+    """
+    Merge two sets of (count, mean, M2) moments (Chan et al.'s parallel form of Welford's update).
+    Works elementwise on aligned arrays or Series.
+    """
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta = mean_b - mean_a
+        mean = np.where(n > 0, mean_a + delta * n_b / n, 0.0)
+        m2 = m2_a + m2_b + np.where(n > 0, delta ** 2 * n_a * n_b / n, 0.0)
+    return n, mean, m2
+
+def _std(n, m2):
+    """Sample standard deviation from a count and M2 (NaN below two values)."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 1, np.sqrt(m2 / np.maximum(n - 1, 1)), np.nan)
+
+class _KeyCoverage:
+    """
+    Which (area, variant, year) keys have been seen, as a bool matrix of (area, variant) pairs x years.
+    Memory follows the key space, not the row count, and repeated keys are detected on insert.
+    """
+
+    def __init__(self):
+        self.pairs = {} # (area, variant) -> row
+        self.first_year = None
+        self.seen = np.zeros((0, 0), dtype=bool)
+
+    def _grow(self, n_pairs, year_min, year_max):
+        """Widen the matrix to cover n_pairs rows and the years [year_min, year_max]."""
+        first = year_min if self.first_year is None else min(self.first_year, year_min)
+        last = year_max if self.first_year is None else max(self.first_year + self.seen.shape[1] - 1, year_max)
+        if first == self.first_year and last - first + 1 == self.seen.shape[1] and n_pairs <= self.seen.shape[0]:
+            return
+        grown = np.zeros((max(n_pairs, self.seen.shape[0]), last - first + 1), dtype=bool)
+        offset = 0 if self.first_year is None else self.first_year - first
+        grown[:self.seen.shape[0], offset:offset + self.seen.shape[1]] = self.seen
+        self.seen, self.first_year = grown, first
+
+    def add(self, areas, variants, years):
+        """
+        Record one chunk of keys.
+        Returns:
+            tuple: (number of duplicate rows, DataFrame of up to 20 duplicated keys)
+        """
+        pair_codes, uniques = pd.MultiIndex.from_arrays([areas, variants]).factorize()
+        rows = np.array([self.pairs.setdefault(pair, len(self.pairs)) for pair in uniques])[pair_codes]
+        self._grow(len(self.pairs), int(years.min()), int(years.max()))
+        cols = years - self.first_year
+
+        flat = rows * self.seen.shape[1] + cols
+        within = pd.Series(flat).duplicated().to_numpy() # Repeats inside this chunk
+        duplicate = within | self.seen[rows, cols]      # ... or of keys from earlier chunks
+        self.seen[rows, cols] = True
+        examples = pd.DataFrame({'area': np.asarray(areas)[duplicate], 'variant': np.asarray(variants)[duplicate],
+                                 'year': years[duplicate]}).drop_duplicates().head(20)
+        return int(duplicate.sum()), examples
+
+    def gaps(self, max_years=20):
+        """Missing years between the first and last year seen, per (area, variant) pair that has any."""
+        gaps = {}
+        for (area, variant), row in self.pairs.items():
+            present = np.flatnonzero(self.seen[row])
+            if len(present) == 0:
+                continue
+            missing = np.setdiff1d(np.arange(present[0], present[-1] + 1), present) + self.first_year
+            if len(missing):
+                gaps[f'{area} | {variant}'] = {'missing': len(missing), 'years': missing[:max_years].tolist()}
+        return gaps
+
+def profile_undata_csv(path, chunksize=CHUNKSIZE, z_threshold=4.0, csv=None):
+    """
+    Data-quality profile of one UNdata export in a single streaming pass.
+    Memory is bounded by one chunk plus per-area and per-key state, never by the file size.
+    Args:
+        path       : str, CSV file path (reported in the profile)
+        chunksize  : int, rows parsed per chunk
+        z_threshold: per-area |z| above which an area's minimum or maximum is reported as an outlier
+        csv        : optional open file to read instead of `path` (e.g. a zip member)
+    Returns:
+        dict with row counts, missing values, Value statistics, duplicate keys, year gaps and outliers
+    """
+    rows = footnotes = unparsable = 0
+    missing = pd.Series(0, index=UNDATA_COLUMNS)
+    moments = (0, 0.0, 0.0)
+    value_min, value_max = np.inf, -np.inf
+    per_area = None # DataFrame indexed by area: n, mean, m2, min, min_year, max, max_year
+    coverage, duplicates, duplicate_examples = _KeyCoverage(), 0, []
+
+    reader = pd.read_csv(path if csv is None else csv, usecols=UNDATA_COLUMNS, dtype={'Year(s)': str, 'Value': str},
+                         chunksize=chunksize)
+    for chunk in reader:
+        rows += len(chunk)
+        year = pd.to_numeric(chunk['Year(s)'], errors='coerce')
+        footnotes += int(year.isna().sum()) # Trailing UNdata footnote rows: any year that does not parse, empty included
+        data = chunk[year.notna()].assign(year=year[year.notna()].astype('int64'))
+        missing += data[UNDATA_COLUMNS].isna().sum() # Over data rows only, so footnotes do not count as missing
+        if data.empty:
+            continue
+        value = pd.to_numeric(data['Value'], errors='coerce')
+        unparsable += int((value.isna() & data['Value'].notna()).sum())
+        data = data.assign(value=value)
+
+        n_dup, examples = coverage.add(data['Country or Area'].to_numpy(), data['Variant'].to_numpy(),
+                                       data['year'].to_numpy())
+        duplicates += n_dup
+        duplicate_examples.append(examples)
+
+        valid = data[data['value'].notna()]
+        if valid.empty:
+            continue
+        v = valid['value'].to_numpy()
+        moments = _merge_moments(moments, (len(v), v.mean(), ((v - v.mean()) ** 2).sum()))
+        value_min, value_max = min(value_min, v.min()), max(value_max, v.max())
+
+        grouped = valid.groupby('Country or Area', sort=False)['value']
+        chunk_area = grouped.agg(n='count', mean='mean', min='min', max='max')
+        chunk_area['m2'] = grouped.var(ddof=0) * chunk_area['n']
+        chunk_area['min_year'] = valid.loc[grouped.idxmin(), 'year'].to_numpy()
+        chunk_area['max_year'] = valid.loc[grouped.idxmax(), 'year'].to_numpy()
+        if per_area is None:
+            per_area = chunk_area
+            continue
+        index = per_area.index.union(chunk_area.index, sort=False)
+        old = per_area.reindex(index)
+        new = chunk_area.reindex(index)
+        n, mean, m2 = _merge_moments(*[(d['n'].fillna(0).to_numpy(), d['mean'].fillna(0).to_numpy(),
+                                        d['m2'].fillna(0).to_numpy()) for d in (old, new)])
+        take_new_min = new['min'].lt(old['min']) | old['min'].isna()
+        take_new_max = new['max'].gt(old['max']) | old['max'].isna()
+        per_area = pd.DataFrame({
+            'n': n, 'mean': mean, 'm2': m2,
+            'min': new['min'].where(take_new_min, old['min']),
+            'min_year': new['min_year'].where(take_new_min, old['min_year']),
+            'max': new['max'].where(take_new_max, old['max']),
+            'max_year': new['max_year'].where(take_new_max, old['max_year']),
+        }, index=index)
+
+    n, mean, m2 = moments
+    outliers = []
+    if per_area is not None:
+        std = _std(per_area['n'].to_numpy(), per_area['m2'].to_numpy())
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for kind in ('min', 'max'):
+                z = (per_area[kind].to_numpy() - per_area['mean'].to_numpy()) / std
+                for area, year, value, score in zip(per_area.index, per_area[f'{kind}_year'], per_area[kind], z):
+                    if np.isfinite(score) and abs(score) > z_threshold:
+                        outliers.append({'area': area, 'year': int(year), 'value': float(value), 'z': float(score)})
+    duplicate_examples = pd.concat(duplicate_examples).drop_duplicates().head(20) if duplicate_examples else None
+
+    return {
+        'path': path,
+        'rows': rows,
+        'footnote_rows': footnotes,
+        'missing': {col: int(count) for col, count in missing.items()},
+        'unparsable_values': unparsable,
+        'value': {'count': int(n), 'mean': float(mean) if n else None, 'std': float(_std(n, m2)) if n > 1 else None,
+                  'min': float(value_min) if n else None, 'max': float(value_max) if n else None},
+        'areas': 0 if per_area is None else len(per_area),
+        'variants': sorted({variant for _, variant in coverage.pairs}),
+        'years': None if coverage.first_year is None else
+                 [coverage.first_year, coverage.first_year + coverage.seen.shape[1] - 1],
+        'duplicate_keys': duplicates,
+        'duplicate_examples': [] if duplicate_examples is None else duplicate_examples.to_dict(orient='records'),
+        'year_gaps': coverage.gaps(),
+        'outliers': sorted(outliers, key=lambda o: -abs(o['z'])),
+    }
+
+def profile_inputs(chunksize=CHUNKSIZE, z_threshold=4.0, manifest=SOURCES_MANIFEST):
+    """
+    Profile the six raw inputs listed in a data-source manifest (CSV and zip sources;
+    SQLite sources hold already-parsed rows and are skipped).
+    Returns:
+        dict name (e.g. 'life_expectancy_both') -> profile
+    """
+    profiles = {}
+    for metric, genders in load_manifest(manifest).items():
+        for gender, source in genders.items():
+            if source['type'] == 'sqlite':
+                continue
+            with open_source_csv(source) as csv:
+                profiles[f'{metric}_{gender}'] = profile_undata_csv(source['path'], chunksize, z_threshold,
+                                                                    csv=None if isinstance(csv, str) else csv)
+    return profiles
+
+def write_data_summary(profiles, txt_path, json_path):
+    """
+    Write the profiles as a readable text report and as JSON.
+    Args:
+        profiles : dict name -> profile from profile_undata_csv
+        txt_path : str, text report path
+        json_path: str, JSON report path
+    """
+    with open(json_path, 'w') as f:
+        json.dump(profiles, f, indent=2)
+
+    def fmt(x):
+        return 'n/a' if x is None else f'{x:,.4f}'
+
+    with open(txt_path, 'w') as f:
+        f.write('===================\n')
+        f.write('Data Summary\n')
+        f.write('===================\n\n')
+        for name, p in profiles.items():
+            f.write(f'--- {name} ({p["path"]}) ---\n')
+            f.write(f'Rows: {p["rows"]} ({p["footnote_rows"]} footnote rows)\n')
+            f.write(f'Areas: {p["areas"]}, variants: {", ".join(p["variants"]) or "-"}, '
+                    f'years: {"-" if p["years"] is None else "-".join(map(str, p["years"]))}\n')
+            f.write('Missing values: ' + ', '.join(f'{col} {n}' for col, n in p['missing'].items())
+                    + f', unparsable Value {p["unparsable_values"]}\n')
+            v = p['value']
+            f.write(f'Value: count {v["count"]}, mean {fmt(v["mean"])}, std {fmt(v["std"])}, '
+                    f'min {fmt(v["min"])}, max {fmt(v["max"])}\n')
+            f.write(f'Duplicate (area, year, variant) keys: {p["duplicate_keys"]}\n')
+            for d in p['duplicate_examples']:
+                f.write(f'  {d["area"]} | {d["variant"]} | {d["year"]}\n')
+            f.write(f'Year coverage gaps: {len(p["year_gaps"])} area/variant series\n')
+            for key, gap in p['year_gaps'].items():
+                f.write(f'  {key}: {gap["missing"]} missing ({", ".join(map(str, gap["years"]))})\n')
+            f.write(f'Outliers (|z| > threshold within area): {len(p["outliers"])}\n')
+            for o in p['outliers']:
+                f.write(f'  {o["area"]} {o["year"]}: {o["value"]:,.4f} (z = {o["z"]:.2f})\n')
+            f.write('\n')
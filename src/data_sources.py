@@ -0,0 +1,215 @@
+import os
+import re
+import json
+import sqlite3
+import zipfile
+from contextlib import contextmanager, closing
+import pandas as pd
+from config import SOURCES_MANIFEST, CACHE_DIR, GENDERS, CHUNKSIZE
+from undata import UNDATA_COLUMNS, read_csv_cached, normalise_filters
+
+# Metrics a manifest maps, each to one source per gender
+METRICS = ['life_expectancy', 'population']
+
+# File extension -> source type, for manifest entries given as a bare path
+SOURCE_TYPES = {'.csv': 'csv', '.zip': 'zip', '.sqlite': 'sqlite', '.sqlite3': 'sqlite', '.db': 'sqlite'}
+
+def _source_entry(entry, base_dir, metric, gender):
+    """Normalise one manifest entry (a path or a dict) into a source dict with an absolute path and type."""
+    source = {'path': entry} if isinstance(entry, str) else dict(entry)
+    source['path'] = os.path.normpath(os.path.join(base_dir, source['path'])) # Relative to the manifest
+    if 'type' not in source:
+        ext = os.path.splitext(source['path'])[1].lower()
+        if ext not in SOURCE_TYPES:
+            raise ValueError(f"Cannot infer the source type of {source['path']!r} (set 'type' to csv, zip or sqlite)")
+        source['type'] = SOURCE_TYPES[ext]
+    if source['type'] not in ('csv', 'zip', 'sqlite'):
+        raise ValueError(f"Unknown source type {source['type']!r} for {metric}/{gender}")
+    if source['type'] == 'sqlite':
+        source.setdefault('table', f'{metric}_{gender}')
+        _check_identifier(source['table'])
+    return source
+
+def _check_identifier(name):
+    """Table names are interpolated into SQL, so only plain identifiers are accepted."""
+    if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', name):
+        raise ValueError(f'Invalid SQLite table name: {name!r}')
+
+def load_manifest(path=SOURCES_MANIFEST):
+    """
+    Load a data-source manifest mapping metric -> gender -> source.
+    A source is a path (type taken from the extension) or a dict with 'path' and optional
+    'type' ('csv', 'zip' or 'sqlite'), 'member' (CSV inside a zip) and 'table' (SQLite table,
+    default '<metric>_<gender>'). Relative paths resolve against the manifest's directory.
+    Args:
+        path: str, JSON manifest path
+    Returns:
+        dict: metric -> gender -> source dict
+    """
+    with open(path) as f:
+        raw = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    manifest = {}
+    for metric in METRICS:
+        missing = [g for g in GENDERS if g not in raw.get(metric, {})]
+        if missing:
+            raise ValueError(f"Manifest {path} has no {metric} source for: {', '.join(missing)}")
+        manifest[metric] = {g: _source_entry(raw[metric][g], base_dir, metric, g) for g in GENDERS}
+    return manifest
+
+def source_files(manifest_path=SOURCES_MANIFEST):
+    """Files a manifest reads (the manifest itself first), for invalidating cached pipeline stages."""
+    manifest = load_manifest(manifest_path)
+    paths = [os.path.abspath(manifest_path)]
+    paths += [s['path'] for genders in manifest.values() for s in genders.values()]
+    return list(dict.fromkeys(paths))
+
+def _zip_member(source):
+    """The CSV member of a zip source: the named one, or the only CSV in the archive."""
+    if source.get('member'):
+        return source['member']
+    with zipfile.ZipFile(source['path']) as archive:
+        members = [n for n in archive.namelist() if n.lower().endswith('.csv')]
+    if len(members) != 1:
+        raise ValueError(f"{source['path']} holds {len(members)} CSV files; set 'member' in the manifest")
+    return members[0]
+
+@contextmanager
+def open_source_csv(source):
+    """Yield something pd.read_csv accepts for a CSV or zip source (a path or an open zip member)."""
+    if source['type'] == 'csv':
+        yield source['path']
+    elif source['type'] == 'zip':
+        with zipfile.ZipFile(source['path']) as archive, archive.open(_zip_member(source)) as f:
+            yield f
+    else:
+        raise ValueError(f"{source['path']} is a {source['type']} source, not a CSV")
+
+def read_sqlite_slice(path, table, areas=None, years=None, variants=None):
+    """
+    Read a UNdata slice from an imported SQLite table with one indexed query.
+    Rows come back in import order, so duplicated keys resolve like the CSV readers.
+    Args:
+        path    : str, SQLite database path
+        table   : str, table written by import_undata_csv
+        areas, years, variants: filters as in undata.read_undata_csv
+    Returns:
+        pd.DataFrame with columns ['Country or Area', 'Year(s)', 'Variant', 'Value']
+    """
+    _check_identifier(table)
+    filters = normalise_filters(areas, years, variants)
+    clauses, params = [], []
+    for column, key in (('area', 'areas'), ('year', 'years'), ('variant', 'variants')):
+        if key in filters:
+            clauses.append(f"{column} IN ({', '.join('?' * len(filters[key]))})")
+            params += list(filters[key])
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+    query = (f'SELECT area AS "Country or Area", year AS "Year(s)", variant AS "Variant", value AS "Value" '
+             f'FROM {table}{where} ORDER BY rowid')
+    if not os.path.exists(path): # sqlite3.connect would silently create an empty database
+        raise FileNotFoundError(f'SQLite source not found: {path} (run the import command first)')
+    with closing(sqlite3.connect(f'file:{path}?mode=ro', uri=True)) as conn: # `with conn` alone never closes it
+        df = pd.read_sql_query(query, conn, params=params)
+    return df.astype({'Year(s)': 'int64', 'Value': 'float64'})[UNDATA_COLUMNS]
+
+def read_source(source, use_cache=True, areas=None, years=None, variants=None, cache_dir=CACHE_DIR):
+    """
+    Read a UNdata slice from any source type.
+    CSV and zip sources are parsed in chunks and served from the binary cache when unchanged;
+    SQLite sources answer the slice with an indexed query and need no cache.
+    Args:
+        source   : source dict from load_manifest
+        use_cache: bool, use the binary cache for CSV and zip sources
+        areas, years, variants: filters as in undata.read_undata_csv
+        cache_dir: str, directory holding cached .npz files
+    Returns:
+        pd.DataFrame with columns ['Country or Area', 'Year(s)', 'Variant', 'Value']
+    """
+    filters = {'areas': areas, 'years': years, 'variants': variants}
+    if source['type'] == 'sqlite':
+        return read_sqlite_slice(source['path'], source['table'], **filters)
+    member = _zip_member(source) if source['type'] == 'zip' else None
+    return read_csv_cached(source['path'], cache_dir=cache_dir, use_cache=use_cache, member=member, **filters)
+
+def import_undata_csv(conn, table, csv, chunksize=CHUNKSIZE):
+    """
+    Bulk-load one UNdata export into a SQLite table, replacing any previous contents.
+    Footnote rows (non-numeric years) are dropped; the (area, year, variant) index is built
+    after the load, which is much faster than maintaining it row by row.
+    Args:
+        conn     : sqlite3.Connection
+        table    : str, destination table
+        csv      : path or file object of the CSV
+        chunksize: int, rows parsed and inserted per chunk
+    Returns:
+        int, number of rows loaded
+    """
+    _check_identifier(table)
+    conn.execute(f'DROP TABLE IF EXISTS {table}')
+    conn.execute(f'CREATE TABLE {table} (area TEXT NOT NULL, year INTEGER NOT NULL, variant TEXT, value REAL)')
+    rows = 0
+    reader = pd.read_csv(csv, usecols=UNDATA_COLUMNS, dtype={'Year(s)': str, 'Value': str}, chunksize=chunksize)
+    for chunk in reader:
+        year = pd.to_numeric(chunk['Year(s)'], errors='coerce')
+        chunk = chunk[year.notna()]
+        records = zip(chunk['Country or Area'].tolist(), year[year.notna()].astype('int64').tolist(),
+                      chunk['Variant'].tolist(), pd.to_numeric(chunk['Value'], errors='coerce').tolist()) # NaN -> NULL
+        conn.executemany(f'INSERT INTO {table} VALUES (?, ?, ?, ?)', records)
+        rows += len(chunk)
+    conn.execute(f'CREATE INDEX {table}_area_year_variant ON {table} (area, year, variant)')
+    return rows
+
+def import_manifest(database, manifest_path=SOURCES_MANIFEST, output_manifest=None):
+    """
+    Import every CSV and zip source of a manifest into one SQLite database and write a
+    manifest that serves the same series from it.
+    The database is built in a temporary file next to it and swapped in only once complete,
+    so a failed import leaves any existing database untouched.
+    Args:
+        database       : str, SQLite database path (created or replaced)
+        manifest_path  : str, manifest listing the sources to import
+        output_manifest: str, manifest to write, defaults to the database path with a .json extension
+    Returns:
+        tuple: (output manifest path, dict table -> rows loaded)
+    """
+    manifest = load_manifest(manifest_path)
+    for metric, genders in manifest.items(): # Validate everything before touching any database
+        for gender, source in genders.items():
+            if source['type'] == 'sqlite':
+                raise ValueError(f'{metric}/{gender} is already a SQLite source ({source["path"]})')
+    output_manifest = output_manifest or os.path.splitext(database)[0] + '.json'
+    directory = os.path.dirname(os.path.abspath(database))
+    os.makedirs(directory, exist_ok=True)
+
+    loaded, entries = {}, {}
+    tmp_path = f'{database}.tmp'
+    if os.path.exists(tmp_path): # Left by an interrupted import
+        os.remove(tmp_path)
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute('PRAGMA journal_mode = OFF') # Scratch file: no rollback journal or fsync per commit needed
+            conn.execute('PRAGMA synchronous = OFF')
+            with conn: # Single transaction for the whole import
+                for metric, genders in manifest.items():
+                    for gender, source in genders.items():
+                        table = f'{metric}_{gender}'
+                        with open_source_csv(source) as csv:
+                            loaded[table] = import_undata_csv(conn, table, csv)
+                        entries.setdefault(metric, {})[gender] = {'type': 'sqlite', 'path': None, 'table': table}
+            conn.execute('ANALYZE') # Planner statistics for the new indexes
+        finally:
+            conn.close()
+        os.replace(tmp_path, database) # Atomic swap: readers see the old or the new database, never a partial one
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    db_path = os.path.relpath(os.path.abspath(database), os.path.dirname(os.path.abspath(output_manifest)))
+    for genders in entries.values():
+        for entry in genders.values():
+            entry['path'] = db_path
+    with open(output_manifest, 'w') as f:
+        json.dump(entries, f, indent=2)
+    return output_manifest, loaded
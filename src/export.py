@@ -0,0 +1,161 @@
+import os
+import pandas as pd
+from area_table import AreaTable
+
+# File extension -> export format; Parquet and Arrow IPC need the optional pyarrow package
+EXPORT_FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow'}
+
+def export_format(path):
+    """Return the export format for a path from its extension (ValueError for unknown extensions)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export extension '{ext}' (use one of {', '.join(EXPORT_FORMATS)})")
+    return EXPORT_FORMATS[ext]
+
+def table_path(path, table):
+    """Path of one exported table: results.csv -> results_<table>.csv."""
+    stem, ext = os.path.splitext(path)
+    return f'{stem}_{table}{ext}'
+
+def _pyarrow():
+    """Import pyarrow on demand so CSV exports (and every other run) work without it."""
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Parquet and Arrow IPC exports need pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+def write_batches(path, batches):
+    """
+    Stream DataFrame batches to one file, in the format given by the path's extension.
+    Only one batch is held in memory at a time; later batches are cast to the first batch's schema.
+    Args:
+        path   : str, output path (.csv, .parquet, .arrow/.feather/.ipc)
+        batches: iterable of DataFrames with the same columns
+    Returns:
+        int, number of rows written (no file is written for an empty iterable)
+    """
+    fmt = export_format(path)
+    rows, writer, sink = 0, None, None
+    if fmt != 'csv':
+        pa = _pyarrow()
+        import pyarrow.parquet as pq
+        import pyarrow.ipc as ipc
+    try:
+        for batch in batches:
+            if fmt == 'csv':
+                if writer is None:
+                    writer = open(path, 'w', newline='')
+                batch.to_csv(writer, header=rows == 0, index=False)
+            else:
+                table = pa.Table.from_pandas(batch, preserve_index=False)
+                if writer is None:
+                    schema = table.schema.remove_metadata()
+                    if fmt == 'parquet':
+                        writer = pq.ParquetWriter(path, schema)
+                    else:
+                        sink = pa.OSFile(path, 'wb')
+                        writer = ipc.new_file(sink, schema)
+                table = table.cast(schema)
+                if fmt == 'parquet':
+                    writer.write_table(table)
+                else:
+                    for record_batch in table.to_batches():
+                        writer.write_batch(record_batch)
+            rows += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+    return rows
+
+def iter_area_batches(mean_area, genders=None, variant=None, batch_rows=100_000):
+    """
+    Flatten the nested area dict into DataFrame batches without building the full table.
+    Args:
+        mean_area : AreaTable or dict of area -> gender -> year -> life expectancy
+        genders   : genders to keep (None keeps all)
+        variant   : optional UN projection variant recorded in a 'variant' column
+        batch_rows: maximum rows per batch
+    Yields:
+        pd.DataFrame with columns ['area', 'year', 'gender', 'life_expectancy'] (+ 'variant')
+    """
+    if isinstance(mean_area, AreaTable): # Slice the columnar view instead of walking dicts
+        frame = mean_area.to_frame()
+        if genders is not None:
+            frame = frame[frame['gender'].isin(genders)]
+        for start in range(0, len(frame), batch_rows):
+            batch = frame.iloc[start:start + batch_rows]
+            yield batch if variant is None else batch.assign(variant=variant)
+        return
+
+    columns = {'area': [], 'year': [], 'gender': [], 'life_expectancy': []}
+
+    def flush():
+        batch = pd.DataFrame(columns)
+        if variant is not None:
+            batch['variant'] = variant
+        for values in columns.values():
+            values.clear()
+        return batch
+
+    for area, gender_dict in mean_area.items():
+        for gender, year_dict in gender_dict.items():
+            if genders is not None and gender not in genders:
+                continue
+            for year, val in year_dict.items():
+                columns['area'].append(area)
+                columns['year'].append(year)
+                columns['gender'].append(gender)
+                columns['life_expectancy'].append(val)
+            if len(columns['area']) >= batch_rows:
+                yield flush()
+    if columns['area']:
+        yield flush()
+
+def export_results(path, global_life, mean_area, t_table=None, anova=None, posthoc=None, periods=None, gender='both',
+                   variant=None, batch_rows=100_000):
+    """
+    Export the analysis results, one file per table next to `path`.
+    Args:
+        path       : str, base output path whose extension selects the format (e.g. results.parquet)
+        global_life: dict of the weighted global series (plus optional confidence bounds)
+        mean_area  : AreaTable (or nested dict) of area -> gender -> year -> life expectancy, streamed in batches
+        t_table    : optional DataFrame from stats_utils.ttest_table
+        anova      : optional (F, p-value) tuple, or the dict from stats_utils.permutation_anova
+        posthoc    : optional DataFrame from stats_utils.pairwise_posthoc
+        periods    : optional (window table, gender table) tuple from stats_utils.period_comparison
+        gender     : gender filter applied to the area table ('both' keeps every gender)
+        variant    : UN projection variant recorded in every table
+        batch_rows : rows per streamed batch of the area table
+    Returns:
+        dict of table name -> (path, rows written)
+    """
+    export_format(path) # Fail on an unsupported extension before writing anything
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tables = {
+        'global': [pd.DataFrame(global_life)],
+        'area': iter_area_batches(mean_area, None if gender == 'both' else [gender], variant, batch_rows),
+    }
+    if t_table is not None:
+        tables['ttest'] = [t_table.reset_index()]
+    if anova is not None:
+        tables['anova'] = [pd.DataFrame([anova]) if isinstance(anova, dict) else
+                           pd.DataFrame({'F': [anova[0]], 'p-value': [anova[1]]})]
+    if posthoc is not None:
+        tables['posthoc'] = [posthoc]
+    if periods is not None:
+        tables['periods'], tables['period_genders'] = [periods[0]], [periods[1]]
+    for name in ('global', 'ttest', 'anova', 'posthoc', 'periods', 'period_genders'):
+        if name in tables and variant is not None:
+            tables[name] = [tables[name][0].assign(variant=variant)]
+
+    written = {}
+    for name, batches in tables.items():
+        out = table_path(path, name)
+        written[name] = (out, write_batches(out, batches))
+    return written
@@ -1,29 +1,60 @@
+import os
 import argparse
-from data_processing import read_life_expectancy_data, calculate_mean_life_expectancy, calculate_population, calculate_weighted_life_expectancy, prepare_area_life_expectancy_df
-from visualisation import plot_global_life_expectancy, plot_area_life_expectancy, plot_animated_map
-from stats_utils import perform_ttest, perform_anova
+from concurrent.futures import ProcessPoolExecutor
+from config import GENDERS, COLOURS, ROOT_DIR, OUTPUT_DIR, SOURCES_MANIFEST, TOPOJSON_FILE
+from data_processing import read_life_expectancy_data, calculate_mean_life_expectancy, calculate_population, calculate_weighted_life_expectancy, prepare_area_life_expectancy_df, build_cube
+from data_processing import parse_window, window_years
+from data_sources import source_files
+from pipeline import Pipeline
+from profiling import StageProfiler
+from visualisation import plot_global_life_expectancy, plot_area_life_expectancy, plot_animated_map, plot_heatmap
+from stats_utils import perform_ttest, perform_anova, permutation_anova, ttest_table, pairwise_posthoc, period_comparison
+from stats_utils import bootstrap_weighted_life_expectancy
 
-file_path = 'data/output'                           # Output directory for generated plots
-colours = ['#F4D0A2', '#A6C9F2', '#D3AED6']   # Color palette for plotting
+file_path = OUTPUT_DIR                               # Output directory for generated plots
+colours = COLOURS                                # Color palette for plotting
+plot_types = ['global', 'area', 'animated', 'heatmap'] # Plot types rendered by --plot all
+plot_outputs = {                                # Files written by each plot type
+    'global': [f'{file_path}/global_average_life_expectancy.png'],
+    'area': [f'{file_path}/area_average_life_expectancy.png'],
+    'animated': [f'{file_path}/life_expectancy_animation.html'],
+    'heatmap': [f'{file_path}/heatmap.png'],
+}
 
+import numpy as np
 import pandas as pd
 
-def print_stats_summary(t_results, f_stat, p_val, alpha=0.05):
+def print_stats_summary(t_results, f_stat, p_val, alpha=0.05, posthoc=None, max_pairs=20, permutation=None):
     """
-    Print ANOVA and post-hoc t-test results in a readable table.
-    - t_results: dict of post-hoc t-test p-values by area
+    Print ANOVA, pairwise post-hoc and per-area male vs female t-test results in readable tables.
+    - t_results: dict of male vs female t-test p-values by area
     - f_stat   : ANOVA F statistic
     - p_val    : ANOVA p-value
     - alpha    : significance threshold
+    - posthoc  : optional DataFrame from pairwise_posthoc (with 'method'/'correction' in attrs)
+    - max_pairs: number of post-hoc pairs listed (smallest adjusted p-values first)
+    - permutation: optional dict from permutation_anova; its p-value then decides significance
     """
     print("\n=== Statistical Summary ===")
     print(f"ANOVA: F = {f_stat:.2f}, p = {p_val:.2e}")
+    if permutation is not None:
+        print(f"Permutation ANOVA ({permutation['permutations']} permutations): p = {permutation['perm p-value']:.2e}, "
+              f"η² = {permutation['eta_sq']:.3f}, ω² = {permutation['omega_sq']:.3f}")
+        p_val = permutation['perm p-value']
 
     if p_val < alpha:
         print("→ Significant differences detected among areas.\n")
     else:
         print("→ No significant differences detected among areas.\n")
 
+    if posthoc is not None:
+        significant = (posthoc['p-adj'] < alpha).sum()
+        print(f"Post-hoc pairwise comparisons ({posthoc.attrs.get('method')}, {posthoc.attrs.get('correction')} "
+              f"correction): {significant} of {len(posthoc)} pairs significant")
+        top = posthoc.nsmallest(max_pairs, 'p-adj')[['group1', 'group2', 'diff', 'p-adj']]
+        print(top.to_string(index=False, formatters={"diff": lambda x: f"{x:+.2f}", "p-adj": lambda x: f"{x:.2e}"}))
+        print()
+
     rows = []
     for area, p in t_results.items():
         rows.append({
@@ -35,48 +66,392 @@ def print_stats_summary(t_results, f_stat, p_val, alpha=0.05):
     # Sort areas by p-value and display as a table
     df = pd.DataFrame(rows).sort_values("p-value")
 
-    print("Post-hoc t-tests (vs rest of world):")
+    print("Male vs female Welch t-tests (per area):")
     print(df.to_string(index=False, formatters={"p-value": lambda x: f"{x:.2e}"}))
 
-def main(plot_type="global", gender="both", no_stats=False):
+def print_period_summary(window_table, gender_table, alpha=0.05):
+    """
+    Print the year-window comparisons pooled over all areas (per-area rows are in the export).
+    - window_table: DataFrame of window statistics from period_comparison
+    - gender_table: DataFrame of male vs female tests per window from period_comparison
+    - alpha       : significance threshold
+    """
+    baseline = window_table['window'].iloc[0]
+    pooled = window_table[window_table['area'] == 'All areas'].drop(columns='area')
+    print("\n=== Period Comparison ===")
+    print(f"All areas pooled, Welch t-tests against {baseline}:")
+    print(pooled.to_string(index=False, formatters={
+        "mean": lambda x: f"{x:.2f}", "std": lambda x: f"{x:.2f}", "diff": lambda x: f"{x:+.2f}",
+        "t": lambda x: f"{x:.2f}", "df": lambda x: f"{x:.1f}", "p-value": lambda x: f"{x:.2e}"}))
+    if len(gender_table):
+        print("\nMale vs female Welch t-tests per window (all areas pooled):")
+        table = gender_table.assign(Significant=np.where(gender_table['p-value'] < alpha, "Yes", "No"))
+        print(table.to_string(index=False, formatters={
+            "male": lambda x: f"{x:.2f}", "female": lambda x: f"{x:.2f}", "diff": lambda x: f"{x:+.2f}",
+            "t": lambda x: f"{x:.2f}", "df": lambda x: f"{x:.1f}", "p-value": lambda x: f"{x:.2e}"}))
+
+def render_plots(selected, global_life, area_df, areas, plot_options=None):
+    """
+    Render the selected plots, in parallel worker processes when more than one is requested.
+    - selected   : list of plot types ('global', 'area', 'animated', 'heatmap')
+    - global_life: dict of weighted global life expectancy
+    - area_df    : flattened DataFrame of area life expectancy
+    - areas      : list of areas for consistent x-axis labels
+    - plot_options: dict plot type -> extra keyword options for its plot function
+    Returns dict plot type -> files written beyond the fixed plot_outputs (e.g. extra area pages).
+    """
+    plot_options = plot_options or {}
+    jobs = {
+        'global': (plot_global_life_expectancy, (global_life, colours, file_path), plot_options.get('global', {})),
+        'area': (plot_area_life_expectancy, (area_df, colours, areas, file_path), plot_options.get('area', {})),
+        'animated': (plot_animated_map, (area_df, file_path), plot_options.get('animated', {})),
+        'heatmap': (plot_heatmap, (area_df, file_path), plot_options.get('heatmap', {})),
+    }
+    if len(selected) == 1:
+        func, args, kwargs = jobs[selected[0]]
+        return {selected[0]: func(*args, **kwargs) or []}
+
+    with ProcessPoolExecutor(max_workers=len(selected)) as pool:
+        futures = {p: pool.submit(jobs[p][0], *jobs[p][1], **jobs[p][2]) for p in selected}
+        return {p: future.result() or [] for p, future in futures.items()} # Re-raises any error from the worker
+
+def add_bootstrap_bands(global_life, mean_area, pop_area, n_replicates, seed=0, resample='regions'):
+    """
+    Return the global series with bootstrap confidence bounds ('<gender>_lower'/'<gender>_upper').
+    - global_life : dict of weighted global life expectancy
+    - mean_area   : dict of area -> gender -> year -> life expectancy
+    - pop_area    : dict of area -> gender -> year -> population
+    - n_replicates: number of bootstrap replicates (0 returns the series unchanged)
+    - seed        : root seed for reproducible resampling
+    - resample    : 'regions' (areas with replacement), 'weights' (Dirichlet population weights) or 'both'
+    """
+    if not n_replicates:
+        return global_life
+    life, areas, years = build_cube(mean_area, years=global_life['year'])
+    pop, _, _ = build_cube(pop_area, areas=areas, years=years)
+    lower, upper = bootstrap_weighted_life_expectancy(life, pop, n_replicates, seed=seed, resample=resample)
+    banded = dict(global_life)
+    for j, g in enumerate(GENDERS):
+        banded[f'{g}_lower'] = list(lower[j])
+        banded[f'{g}_upper'] = list(upper[j])
+    return banded
+
+def mean_life_from_raw(raw, areas=None, years=None):
+    """Mean life expectancy by area from the (life_dfs, pop_dfs) load stage (None keeps every area/year loaded)."""
+    return calculate_mean_life_expectancy(raw[0], areas=areas, years=years)
+
+def population_from_raw(raw, areas=None, years=None):
+    """Population by area from the (life_dfs, pop_dfs) load stage (None keeps every area/year loaded)."""
+    return calculate_population(raw[1], areas=areas, years=years)
+
+def population_for(raw, mean_area):
+    """
+    Population for the areas and years of an age-cube slice, from the (life_dfs, pop_dfs) load stage.
+    Raises ValueError when none of the slice's areas has population rows, which would leave the
+    weighted global series all NaN; areas without population are reported and drop out of the weighting.
+    """
+    areas, years = list(mean_area.areas), np.unique(mean_area.years).tolist()
+    pop_area = calculate_population(raw[1], areas=areas, years=years)
+    covered = set(np.asarray(pop_area.areas)[np.unique(pop_area.area_codes)])
+    if not covered:
+        span = f" in {years[0]}-{years[-1]}" if years else ""
+        raise ValueError(f"None of the {len(areas)} age-cube areas has population rows{span} in the data sources")
+    if len(covered) < len(areas):
+        print(f"Note: {len(areas) - len(covered)} of {len(areas)} age-cube areas have no population rows "
+              f"and are left out of the weighted global series")
+    return pop_area
+
+def list_areas(area_df):
+    """Areas in first-seen order, used for consistent x-axis labels."""
+    return area_df['area'].unique().tolist()
+
+def filter_gender(area_df, gender="both"):
+    """Filter the area DataFrame by gender ('both' keeps every row)."""
+    return area_df if gender == "both" else area_df[area_df['gender'] == gender]
+
+def main(plot_type="global", gender="both", no_stats=False, use_cache=True, variant="Medium", bootstrap=0, seed=0,
+         resample="regions", profile=False, profile_pstats=False, plot_options=None, export=None, posthoc="welch", correction=None, periods=None, permutations=0,
+         sources=SOURCES_MANIFEST, age_cube=None, age=0, years=None, areas=None):
     """
     Main workflow for life expectancy analysis.
-    - plot_type: type of plot to generate ('global', 'area', 'animated')
+    Each step is a memoized pipeline stage, so re-runs only recompute what changed.
+    - plot_type: plot type or list of plot types ('global', 'area', 'animated', 'heatmap', 'all')
     - gender   : filter by 'male', 'female', or 'both'
     - no_stats : if True, skip statistical analysis
+    - use_cache: if False, re-parse the raw CSVs and recompute every stage and plot
+    - variant  : UN projection variant to analyse (e.g. 'Medium', 'Low', 'High')
+    - bootstrap: number of bootstrap replicates for confidence bands (0 to skip)
+    - seed     : root seed for the bootstrap
+    - resample : what the bootstrap resamples: 'regions', 'weights' (population weights) or 'both'
+    - profile  : if True, record per-stage timing and memory to data/output/profile_trace.json
+    - profile_pstats: if True (with profile), also dump cProfile stats to data/output/profile.pstats
+    - plot_options: dict plot type -> extra keyword options for its plot function
+                    (e.g. {'area': {'per_page': 6}, 'animated': {'renderer': 'geo'}})
+    - export   : optional results path; the extension (.csv, .parquet, .arrow) selects the format
+    - posthoc  : pairwise post-hoc method after the ANOVA ('welch', 'games-howell', 'tukey' or 'none')
+    - correction: multiple-testing correction ('holm', 'bh', 'bonferroni', 'none'); defaults to 'holm'
+                  for Welch and 'none' for Games-Howell/Tukey, which already control the family-wise error
+    - periods  : optional list of inclusive (start, end) year windows to compare, the first being the baseline;
+                 their years are loaded even outside `years`, and a window without data is an error
+    - permutations: label permutations for a permutation ANOVA with effect sizes (0 to skip); uses `seed`
+    - sources  : data-source manifest mapping each (metric, gender) series to a CSV, zip or SQLite source
+    - age_cube : optional age-specific life expectancy cube (age_cube.build_age_cube); when set, life
+                 expectancy at `age` for `variant` is read lazily from it instead of the e0 sources
+    - age      : exact age of the life expectancy read from age_cube
+    - years    : optional list of years to analyse and plot; None keeps every year in the data
+    - areas    : optional list of areas to analyse and plot; None keeps every area in the data
     """
-    life_dfs, pop_dfs = read_life_expectancy_data()                       # Load raw life expectancy and population data
-
-    mean_area = calculate_mean_life_expectancy(life_dfs)                  # Calculate mean life expectancy by
-    pop_area = calculate_population(pop_dfs)                              # Calculate population
-    global_life = calculate_weighted_life_expectancy(mean_area, pop_area) # Global weighted life expectancy
-    area_df = prepare_area_life_expectancy_df(mean_area)                  # Flattened DataFrame for area life expectancy
+    plot_options = plot_options or {}
+    profiler = StageProfiler(use_cprofile=profile_pstats) if profile else None
+    pipe = Pipeline(enabled=use_cache, profiler=profiler)
+    years = None if years is None else tuple(years)
+    area_filter = None if areas is None else tuple(areas) # `areas` is reused below for the plotted area labels
+    period_years = tuple(window_years(periods)) if periods else None
+    load_years = years if years is None or not periods else tuple(sorted(set(years) | set(period_years)))
+    raw = pipe.stage('load', read_life_expectancy_data, files=source_files(sources), use_cache=use_cache,
+                     areas=area_filter, years=load_years, variants=variant, manifest=sources)
 
-    areas = area_df['area'].unique().tolist()
+    def life_stage(name, stage_years):
+        """Mean life expectancy by area for the given years, from the age cube or the load stage."""
+        if age_cube: # Only the pages of one (variant, age) block are read from the memory-mapped cube
+            from age_cube import read_age_slice, sidecar_path
+            return pipe.stage(name, read_age_slice, files=[age_cube, sidecar_path(age_cube)],
+                              path=age_cube, variant=variant, age=age, areas=area_filter, years=stage_years)
+        return pipe.stage(name, mean_life_from_raw, raw, areas=area_filter, years=stage_years)
 
-    # Filter by gender only (no year filtering)
-    if gender != "both":
-        area_df = area_df[area_df['gender'] == gender]
+    mean_area = life_stage('mean_life_expectancy', years)                                  # Mean life expectancy by area
+    if age_cube: # Population for the cube's own areas and years, which need not be the e0 sources' areas
+        try:
+            pop_area = pipe.stage('population', population_for, raw, mean_area)
+            pop_area.value # Check the overlap here, not deep inside the weighting or a plot worker
+        except ValueError as e:
+            raise SystemExit(f"--age-cube: {e}")
+    else:
+        pop_area = pipe.stage('population', population_from_raw, raw, areas=area_filter, years=years) # By area
+    global_life = pipe.stage('weighted_global', calculate_weighted_life_expectancy, mean_area, pop_area)
+    global_life = pipe.stage('bootstrap', add_bootstrap_bands, global_life, mean_area, pop_area,
+                             n_replicates=bootstrap, seed=seed, resample=resample)        # Confidence bands (optional)
+    area_df = pipe.stage('area_df', prepare_area_life_expectancy_df, mean_area)            # Flattened area DataFrame
+    areas = pipe.stage('areas', list_areas, area_df)
+    area_df = pipe.stage('area_df_gender', filter_gender, area_df, gender=gender)          # Filter by gender only
 
-    # Generate plots based on selected type
-    if plot_type == "global":
-        plot_global_life_expectancy(global_life, colours, file_path)
-    elif plot_type == "area":
-        plot_area_life_expectancy(area_df, colours, areas, file_path)
-    elif plot_type == "animated":
-        plot_animated_map(area_df, file_path)
+    # Generate plots based on selected types (computed once, rendered together), skipping up-to-date files
+    selected = [plot_type] if isinstance(plot_type, str) else list(plot_type)
+    if "all" in selected:
+        selected = plot_types
+    render_deps = {'global': (global_life,), 'area': (area_df, areas), 'animated': (area_df,), 'heatmap': (area_df,)}
+    render_functions = {'global': plot_global_life_expectancy, 'area': plot_area_life_expectancy,
+                        'animated': plot_animated_map, 'heatmap': plot_heatmap}
+    outputs = {p: list(files) for p, files in plot_outputs.items()}
+    if plot_options.get('animated', {}).get('include_plotlyjs', 'directory') == 'directory':
+        outputs['animated'].append(f'{file_path}/plotly.min.js') # Shared bundle referenced by the HTML
+    animated = plot_options.get('animated', {})
+    if animated.get('topojson') and animated.get('renderer', 'geo') != 'mapbox':
+        outputs['animated'].append(f'{file_path}/world_110m.json') # Local base map referenced by the HTML
+    stale = {}
+    for p in dict.fromkeys(selected):
+        key, is_stale = pipe.output_key(f'plot_{p}', render_functions[p], *render_deps[p], outputs=outputs[p],
+                                        colours=colours, file_path=file_path,
+                                        **plot_options.get(p, {}))
+        if is_stale:
+            stale[p] = key
+    if stale:
+        with pipe.profile('render_' + '_'.join(stale), cache='miss'):
+            written = render_plots(list(stale),
+                         global_life.value if 'global' in stale else None,   # Only load inputs of stale plots
+                         area_df.value if stale.keys() & {'area', 'animated', 'heatmap'} else None,
+                         areas.value if 'area' in stale else None,
+                         plot_options)
+        for p, key in stale.items():
+            pipe.mark_rendered(f'plot_{p}', key, list(dict.fromkeys(outputs[p] + written[p]))) # Incl. extra pages
 
     # Stats (across all years) if not skipped
     if not no_stats:
-        t_results = perform_ttest(area_df)
-        f_stat, p_val = perform_anova(area_df)
-        print_stats_summary(t_results, f_stat, p_val)
+        t_results = pipe.stage('ttest', perform_ttest, area_df).value
+        f_stat, p_val = pipe.stage('anova', perform_anova, area_df).value
+        permutation = None
+        if permutations:
+            permutation = pipe.stage('anova_permutation', permutation_anova, area_df,
+                                     n_permutations=permutations, seed=seed).value
+        if posthoc != "none":
+            correction = correction or ("holm" if posthoc == "welch" else "none")
+            posthoc_table = pipe.stage('posthoc', pairwise_posthoc, area_df, method=posthoc, correction=correction).value
+            posthoc_table.attrs.update(method=posthoc, correction=correction)
+        else:
+            posthoc_table = None
+        print_stats_summary(t_results, f_stat, p_val, posthoc=posthoc_table, permutation=permutation)
+
+    # Year-window comparisons across all areas and genders (requested explicitly, so run even with no_stats)
+    period_tables = None
+    if periods:
+        # With --years the windows may reach past the analysed years, so they get their own slice of the load
+        period_area = mean_area if years is None else life_stage('period_life_expectancy', period_years)
+        try:
+            period_tables = pipe.stage('periods', period_comparison, period_area, windows=tuple(periods)).value
+        except ValueError as e:
+            raise SystemExit(f"--periods: {e}")
+        print_period_summary(*period_tables)
+
+    # Export the global series, area table and (unless skipped) stats tables
+    if export:
+        from export import export_results
+        t_table = None if no_stats else pipe.stage('ttest_table', ttest_table, area_df).value
+        with pipe.profile('export', cache='miss'):
+            written = export_results(export, global_life.value, mean_area.value, t_table=t_table,
+                                     anova=None if no_stats else permutation or (f_stat, p_val),
+                                     posthoc=None if no_stats else posthoc_table, periods=period_tables,
+                                     gender=gender, variant=variant)
+        for name, (path, rows) in written.items():
+            print(f"Exported {name:<14} {rows:>6} rows to {path}")
+
+    if profiler:
+        profiler.finish(f'{file_path}/profile_trace.json', f'{file_path}/profile.pstats' if profile_pstats else None)
+        profiler.print_summary()
+    pipe.report()
+
+def positive_int(text):
+    """argparse type for counts that must be at least 1."""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Life Expectancy Analysis CLI")
+    parser.add_argument("command", nargs="?", choices=["run", "serve", "batch", "rollup", "import"], default="run",
+                        help="'run' the analysis (default), 'serve' queries over HTTP, run a 'batch' scenario matrix, "
+                             "check region 'rollup's against published rows, or 'import' the sources into SQLite")
+    parser.add_argument("--sources", default=SOURCES_MANIFEST,
+                        help="Data-source manifest mapping each metric and gender to a CSV, zip or SQLite source "
+                             "(default: data/sources.json)")
+    parser.add_argument("--database", default=os.path.join(ROOT_DIR, "data", "undata.sqlite"),
+                        help="SQLite database written by 'import', next to a manifest of the same name (.json)")
     parser.add_argument("--no-stats", action="store_true", help="Skip statistical analysis and only generate visual outputs")
-    parser.add_argument("--plot", choices=["global", "area", "animated"], default="global")
+    parser.add_argument("--plot", choices=plot_types + ["all"], action="append",
+                        help="Plot type to generate; repeat the flag or use 'all' to render several in parallel")
     parser.add_argument("--gender", choices=["both", "male", "female"], default="both")
+    parser.add_argument("--no-cache", action="store_true", help="Re-parse the raw CSVs and recompute every stage and plot")
+    parser.add_argument("--variant", default="Medium", help="UN projection variant to analyse (Medium, Low, High, ...)")
+    parser.add_argument("--years", metavar="WINDOWS",
+                        help="Comma-separated year windows to analyse and plot (e.g. 1950-2023 or 2019-2024,2030); "
+                             "default: every year in the data")
+    parser.add_argument("--areas", nargs="+", metavar="AREA",
+                        help="Areas ('Country or Area' names) to analyse and plot; default: every area in the data")
+    parser.add_argument("--bootstrap", type=int, default=0, metavar="N", help="Draw N bootstrap replicates and plot confidence bands for the global series")
+    parser.add_argument("--bootstrap-resample", choices=["regions", "weights", "both"], default="regions",
+                        help="Bootstrap resampling: areas with replacement, Dirichlet population weights, or both")
+    parser.add_argument("--seed", type=int, default=0, help="Root seed for reproducible resampling")
+    parser.add_argument("--profile", action="store_true", help="Record per-stage wall/CPU time and memory to data/output/profile_trace.json")
+    parser.add_argument("--profile-pstats", action="store_true", help="With --profile, also dump cProfile stats to data/output/profile.pstats")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address for 'serve'")
+    parser.add_argument("--port", type=int, default=8050, help="Port for 'serve'")
+    parser.add_argument("--variants", default="Medium", help="Comma-separated variants for 'batch'")
+    parser.add_argument("--genders", default="both", help="Comma-separated genders for 'batch'")
+    parser.add_argument("--plots", default="global", help="Comma-separated plot types for 'batch'")
+    parser.add_argument("--windows", default="2019-2024", help="Comma-separated year windows (e.g. 2019-2021,2022-2024) for 'batch'")
+    parser.add_argument("--workers", type=int, help="Worker processes for 'batch' (default: all cores)")
+    parser.add_argument("--hierarchy", default=None, help="Region mapping file for 'rollup' and '--heatmap-order hierarchy' (default: config.REGION_HIERARCHY_FILE)")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Max abs difference in years for 'rollup' agreement")
+    parser.add_argument("--years-per-page", type=positive_int, default=6,
+                        help="Years (panels) per page of the area plot; longer ranges are paged")
+    parser.add_argument("--area-pages", choices=["pdf", "png"], default="pdf",
+                        help="Write extra area plot pages to one multi-page PDF or to numbered PNGs")
+    parser.add_argument("--map-renderer", choices=["geo", "mapbox"], default="geo",
+                        help="Animated map renderer: 'geo' (base map from --topojson, else cdn.plot.ly) "
+                             "or 'mapbox' with open-street-map tiles (needs network)")
+    parser.add_argument("--topojson", default=TOPOJSON_FILE,
+                        help="Local world_110m.json copied next to the animation so the 'geo' base map loads "
+                             "without network (default: data/topojson/world_110m.json, used when present)")
+    parser.add_argument("--plotlyjs", choices=["directory", "inline", "cdn"], default="directory",
+                        help="How the animation loads plotly.js: shared local file, embedded bundle, or CDN")
+    parser.add_argument("--frame-step", type=positive_int, default=1, help="Keep every n-th year as an animation frame")
+    parser.add_argument("--heatmap-order", choices=["cluster", "hierarchy", "none"], default="cluster",
+                        help="Heatmap row order: hierarchical clustering, region hierarchy (see --hierarchy), or data order")
+    parser.add_argument("--profile-data", action="store_true",
+                        help="Profile the raw inputs (missing values, statistics, duplicate keys, year gaps, outliers) and exit")
+    parser.add_argument("--permutations", type=int, default=0, metavar="N",
+                        help="Also run a permutation ANOVA with N label permutations (uses --seed) and report η² and ω²")
+    parser.add_argument("--posthoc", choices=["welch", "games-howell", "tukey", "none"], default="welch",
+                        help="Pairwise post-hoc comparison of areas after the ANOVA")
+    parser.add_argument("--correction", choices=["holm", "bh", "bonferroni", "none"],
+                        help="Multiple-testing correction for post-hoc p-values (default: holm for welch, none otherwise)")
+    parser.add_argument("--periods", metavar="WINDOWS",
+                        help="Comma-separated year windows to compare (e.g. 2019-2019,2020-2021,2022-2024); "
+                             "the first is the baseline")
+    parser.add_argument("--age-cube", metavar="PATH",
+                        help="Analyse life expectancy at --age from a memory-mapped age cube (.npy with a .json sidecar)")
+    parser.add_argument("--age", type=int, default=0, help="Exact age read from --age-cube (default 0, i.e. e0)")
+    parser.add_argument("--export", metavar="PATH",
+                        help="Export results to PATH (.csv, .parquet or .arrow), one file per table")
     args = parser.parse_args()
+    if args.export:
+        from export import export_format
+        try:
+            export_format(args.export)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        periods = [parse_window(w) for w in args.periods.split(",")] if args.periods else None
+        years = window_years(parse_window(w) for w in args.years.split(",")) if args.years else None
+        windows = [parse_window(w) for w in args.windows.split(",")]
+    except ValueError as e:
+        parser.error(f"invalid year window: {e} (expected windows like 2019-2019,2020-2021)")
+    if args.topojson != TOPOJSON_FILE and not os.path.exists(args.topojson):
+        parser.error(f"--topojson file not found: {args.topojson}")
+    topojson = args.topojson if os.path.exists(args.topojson) else None # The CDN base map otherwise
+    plot_options = {
+        "area": {"per_page": args.years_per_page, "page_format": args.area_pages},
+        "animated": {"renderer": args.map_renderer, "frame_step": args.frame_step, "topojson": topojson,
+                     "include_plotlyjs": True if args.plotlyjs == "inline" else args.plotlyjs},
+        "heatmap": {"row_order": args.heatmap_order, "hierarchy": args.hierarchy},
+    }
+
+    if args.profile_data:
+        from data_quality import profile_inputs, write_data_summary
+        profiles = profile_inputs(manifest=args.sources)
+        write_data_summary(profiles, f"{file_path}/data_summary.txt", f"{file_path}/data_summary.json")
+        for name, p in profiles.items():
+            print(f"{name:<24} {p['rows']:>8} rows  {p['duplicate_keys']:>4} duplicate keys  "
+                  f"{len(p['year_gaps']):>4} gapped series  {len(p['outliers']):>4} outliers")
+        print(f"Data summary written to {file_path}/data_summary.txt (and .json)")
+        raise SystemExit
+
+    if args.command == "import":
+        from data_sources import import_manifest
+        manifest, loaded = import_manifest(args.database, args.sources)
+        for table, rows in loaded.items():
+            print(f"{table:<24} {rows:>8} rows")
+        print(f"Imported into {args.database}; run with --sources {manifest}")
+        raise SystemExit
+
+    if args.command == "rollup":
+        from regions import check_rollups
+        from config import REGION_HIERARCHY_FILE
+        summary = check_rollups(args.hierarchy or REGION_HIERARCHY_FILE, use_cache=not args.no_cache,
+                                variant=args.variant, tolerance=args.tolerance)
+        print("\n=== Region Roll-up vs Published ===")
+        print(summary.to_string(index=False, formatters={"max_abs_diff": lambda x: f"{x:.3f}"}))
+        raise SystemExit
+
+    if args.command == "batch":
+        from batch import build_scenarios, run_batch
+        scenarios = build_scenarios(args.variants.split(","), args.genders.split(","), args.plots.split(","),
+                                    windows)
+        manifest = run_batch(scenarios, output_root=file_path, use_cache=not args.no_cache, workers=args.workers)
+        for r in manifest['scenarios']:
+            print(f"{r['id']:<40} {r['seconds']:>7.2f}s  {r['status']}")
+        print(f"Manifest written to {file_path}/batch_manifest.json")
+        raise SystemExit
+
+    if args.command == "serve":
+        from server import serve
+        serve(host=args.host, port=args.port, use_cache=not args.no_cache, variant=args.variant)
+        raise SystemExit
 
-    main(plot_type=args.plot, gender=args.gender, no_stats=args.no_stats)
\ No newline at end of file
+    main(plot_type=args.plot or ["global"], gender=args.gender, no_stats=args.no_stats, use_cache=not args.no_cache,
+         variant=args.variant, bootstrap=args.bootstrap, seed=args.seed,
+         resample=args.bootstrap_resample, profile=args.profile,
+         profile_pstats=args.profile_pstats, plot_options=plot_options, export=args.export,
+         posthoc=args.posthoc, correction=args.correction, periods=periods,
+         permutations=args.permutations, sources=args.sources, age_cube=args.age_cube, age=args.age,
+         years=years, areas=args.areas)
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import pickle
+import glob
+import hashlib
+from functools import lru_cache
+from contextlib import nullcontext
+from config import CACHE_DIR
+
+def _fingerprint(path):
+    """Identify a file by absolute path, size and mtime (empty string if it does not exist)."""
+    if not os.path.exists(path):
+        return ''
+    stat = os.stat(path)
+    return f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+
+@lru_cache(maxsize=None)
+def _code_version():
+    """
+    Fingerprint every module in src/. Stage functions delegate to helpers in other modules
+    (e.g. area_table), so any source edit invalidates every stage and rendered output.
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    return hashlib.sha1('\n'.join(_fingerprint(p) for p in sorted(glob.glob(os.path.join(src_dir, '*.py'))))
+                        .encode()).hexdigest()
+
+def _code_fingerprint(fn):
+    """Identify the code behind a stage function: its own source file plus the src/ code version."""
+    module = sys.modules.get(fn.__module__)
+    return _fingerprint(getattr(module, '__file__', '') or '') + ':' + _code_version()
+
+class StageResult:
+    """
+    Lazily evaluated output of a pipeline stage.
+    The value is loaded from disk on a cache hit, or computed (which may pull
+    upstream values) on a miss, only when something downstream needs it.
+    """
+
+    def __init__(self, pipeline, name, key, fn, deps, params):
+        self.pipeline = pipeline
+        self.name = name
+        self.key = key
+        self.fn = fn
+        self.deps = deps
+        self.params = params
+        self._loaded = False
+        self._value = None
+
+    @property
+    def value(self):
+        if not self._loaded:
+            self._value = self.pipeline._load_or_compute(self)
+            self._loaded = True
+        return self._value
+
+class Pipeline:
+    """
+    Memoized stage DAG: each stage output is stored on disk under a key hashed from
+    its function, parameters, input files and upstream stage keys.
+    """
+
+    def __init__(self, cache_dir=os.path.join(CACHE_DIR, 'stages'), enabled=True, profiler=None):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.profiler = profiler # Optional profiling.StageProfiler
+        self.status = {} # stage name -> 'hit', 'miss' or 'skipped'
+
+    def profile(self, name, **info):
+        """Context manager profiling a block as one stage when a profiler is attached."""
+        return self.profiler.stage(name, **info) if self.profiler else nullcontext()
+
+    def _key(self, name, fn, deps, files, params):
+        parts = [name, f'{fn.__module__}.{fn.__qualname__}', _code_fingerprint(fn)]
+        parts += [d.key for d in deps]
+        parts += [_fingerprint(p) for p in files]
+        parts.append(repr(sorted(params.items())))
+        return hashlib.sha1('\n'.join(parts).encode()).hexdigest()[:16]
+
+    def stage(self, name, fn, *deps, files=(), **params):
+        """
+        Declare a stage computing fn(*upstream values, **params).
+        Args:
+            name  : str, unique stage name
+            fn    : top-level function computing the stage
+            deps  : StageResult inputs, passed positionally
+            files : input file paths whose changes invalidate the stage
+            params: keyword arguments passed to fn and hashed into the key
+        Returns:
+            StageResult
+        """
+        key = self._key(name, fn, deps, files, params)
+        self.status.setdefault(name, 'skipped')
+        return StageResult(self, name, key, fn, deps, params)
+
+    def _stage_path(self, name, key):
+        return os.path.join(self.cache_dir, f'{name}-{key}.pkl')
+
+    def _load_or_compute(self, result):
+        path = self._stage_path(result.name, result.key)
+        if self.enabled and os.path.exists(path):
+            self.status[result.name] = 'hit'
+            with self.profile(result.name, cache='hit'), open(path, 'rb') as f:
+                return pickle.load(f)
+
+        self.status[result.name] = 'miss'
+        args = [d.value for d in result.deps] # Resolve upstream first so stage profiles do not nest
+        with self.profile(result.name, cache='miss'):
+            value = result.fn(*args, **result.params)
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True) # Versions for other parameters are kept, e.g. each --gender
+            with open(f'{path}.tmp', 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f'{path}.tmp', path)
+        return value
+
+    def output_key(self, name, fn, *deps, outputs=(), **params):
+        """
+        Work out whether a rendered output is stale.
+        Args:
+            name   : str, output name (e.g. plot type)
+            fn     : function that renders the output
+            deps   : StageResult inputs of the render
+            outputs: paths the render always writes; files it wrote beyond these (e.g. extra
+                     pages) are taken from the last mark_rendered and checked as well
+            params : render parameters hashed into the key
+        Returns:
+            tuple: (key, stale) where stale is True if the output must be re-rendered
+        """
+        key = self._key(name, fn, deps, (), params)
+        marker = os.path.join(self.cache_dir, f'{name}.rendered')
+        stale = True
+        if self.enabled and os.path.exists(marker) and all(os.path.exists(p) for p in outputs):
+            try:
+                with open(marker) as f:
+                    rendered = json.load(f)
+                stale = rendered['key'] != key or any(_fingerprint(p) != fp for p, fp in rendered['outputs'].items()) \
+                    or not set(map(os.path.abspath, outputs)) <= set(rendered['outputs'])
+            except (ValueError, KeyError): # Marker from an older version
+                stale = True
+        self.status[name] = 'miss' if stale else 'hit'
+        return key, stale
+
+    def mark_rendered(self, name, key, outputs=()):
+        """Record that an output was rendered from the given key, with every file the render wrote."""
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, f'{name}.rendered'), 'w') as f:
+            json.dump({'key': key, 'outputs': {os.path.abspath(p): _fingerprint(p) for p in outputs}}, f)
+
+    def report(self):
+        """Print which stages were served from cache, recomputed or never needed."""
+        print("\n=== Pipeline Stages ===")
+        for name, status in self.status.items():
+            print(f"{name:<28} {status}")
@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource # Unix only
+except ImportError:
+    resource = None
+
+def _usage(who):
+    """getrusage for RUSAGE_SELF or RUSAGE_CHILDREN (None where unavailable)."""
+    return resource.getrusage(who) if resource is not None else None
+
+def _maxrss_mib(usage):
+    """High-water resident set size of a getrusage result in MiB (None where unavailable)."""
+    if usage is None:
+        return None
+    return usage.ru_maxrss / 2 ** (20 if sys.platform == 'darwin' else 10) # bytes on macOS, KiB elsewhere
+
+def _cpu_s(usage):
+    return usage.ru_utime + usage.ru_stime if usage is not None else 0.0
+
+def _current_rss_mib():
+    """Current resident set size in MiB from /proc (None where unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+class StageProfiler:
+    """
+    Record wall time, CPU time, memory and tracemalloc peak for each pipeline stage.
+    Memory per stage is the change in current RSS across it; ru_maxrss only ever rises, so
+    the process peak is recorded as a high-water mark rather than a per-stage figure.
+    Work in worker processes (render pools, bootstrap, permutations) is counted through
+    RUSAGE_CHILDREN: their CPU time is added to the stage and the largest worker's peak
+    RSS so far is recorded for stages that ran any.
+    Optionally run cProfile over the whole run for a pstats dump.
+    """
+
+    def __init__(self, use_cprofile=False):
+        self.records = []
+        self._profile = cProfile.Profile() if use_cprofile else None
+        tracemalloc.start()
+        if self._profile:
+            self._profile.enable()
+
+    @contextmanager
+    def stage(self, name, **info):
+        """Profile the enclosed block as one stage; extra keyword info is stored in the record."""
+        tracemalloc.reset_peak()
+        rss_before, children_before = _current_rss_mib(), _usage(resource.RUSAGE_CHILDREN) if resource else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            rss_after, children = _current_rss_mib(), _usage(resource.RUSAGE_CHILDREN) if resource else None
+            worker_cpu = _cpu_s(children) - _cpu_s(children_before) # Workers reaped during the stage
+            self.records.append({
+                'stage': name,
+                'wall_s': wall,
+                'cpu_s': cpu + worker_cpu,
+                'worker_cpu_s': worker_cpu,
+                'rss_before_mib': rss_before,
+                'rss_after_mib': rss_after,
+                'rss_delta_mib': rss_after - rss_before if rss_before is not None else None,
+                'process_peak_rss_mib': _maxrss_mib(_usage(resource.RUSAGE_SELF) if resource else None),
+                'worker_peak_rss_mib': _maxrss_mib(children) if worker_cpu > 0 else None,
+                'tracemalloc_peak_mib': tracemalloc.get_traced_memory()[1] / 2 ** 20,
+                **info,
+            })
+
+    def finish(self, trace_path, pstats_path=None):
+        """
+        Stop profiling and write the JSON trace (and the pstats dump if cProfile was on).
+        Args:
+            trace_path : str, JSON trace output path
+            pstats_path: str, pstats output path
+        """
+        if self._profile:
+            self._profile.disable()
+            if pstats_path:
+                self._profile.dump_stats(pstats_path)
+        tracemalloc.stop()
+        with open(trace_path, 'w') as f:
+            json.dump({'stages': self.records}, f, indent=2)
+
+    def print_summary(self):
+        """Print a per-stage timing and memory table."""
+        print("\n=== Profile Summary ===")
+        print(f"{'Stage':<30} {'Wall s':>8} {'CPU s':>8} {'RSS delta MiB':>14} {'Process peak MiB':>17} "
+              f"{'Worker peak MiB':>16} {'Py peak MiB':>12}")
+        fmt = lambda v, spec: format(v, spec) if v is not None else '-'
+        for r in self.records:
+            print(f"{r['stage']:<30} {r['wall_s']:>8.3f} {r['cpu_s']:>8.3f} {fmt(r['rss_delta_mib'], '+.1f'):>14} "
+                  f"{fmt(r['process_peak_rss_mib'], '.1f'):>17} {fmt(r['worker_peak_rss_mib'], '.1f'):>16} "
+                  f"{r['tracemalloc_peak_mib']:>12.1f}")
+        print("CPU s includes worker processes; process and worker peaks are high-water marks so far, not per stage.")
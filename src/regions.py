@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from config import WHO_AREAS_COORDINATES, REGION_HIERARCHY_FILE, GENDERS
+
+def load_region_hierarchy(path=REGION_HIERARCHY_FILE):
+    """
+    Load the region registry from a mapping file with columns ['area', 'parent', 'lat', 'lon'].
+    Rows can describe any tree, e.g. country -> UN subregion -> WHO region -> World;
+    an empty parent marks a root.
+    Args:
+        path: str, CSV mapping file
+    Returns:
+        tuple: (dict area -> parent or None, dict area -> {'lat', 'lon'} merged over WHO_AREAS_COORDINATES)
+    """
+    mapping = pd.read_csv(path, dtype={'area': str, 'parent': str})
+    parents = {area: (parent if isinstance(parent, str) and parent else None)
+               for area, parent in zip(mapping['area'], mapping['parent'])}
+    for area, parent in parents.items():
+        if parent is not None and parent not in parents:
+            parents.setdefault(parent, None) # Parents only named as parents are roots
+    _check_acyclic(parents)
+
+    coordinates = dict(WHO_AREAS_COORDINATES)
+    if {'lat', 'lon'} <= set(mapping.columns):
+        located = mapping.dropna(subset=['lat', 'lon'])
+        coordinates.update({a: {'lat': float(la), 'lon': float(lo)}
+                            for a, la, lo in zip(located['area'], located['lat'], located['lon'])})
+    return parents, coordinates
+
+def _check_acyclic(parents):
+    """Raise ValueError if following parents from any area loops back on itself."""
+    for area in parents:
+        seen, node = set(), area
+        while node is not None:
+            if node in seen:
+                raise ValueError(f'Region hierarchy has a cycle through {node!r}')
+            seen.add(node)
+            node = parents.get(node)
+
+def _ancestors(parents, area):
+    """Ancestors of an area from its parent up to the root."""
+    chain, node = [], parents.get(area)
+    while node is not None:
+        chain.append(node)
+        node = parents.get(node)
+    return chain
+
+def build_rollup_matrices(parents, leaves=None):
+    """
+    Precompute one sparse aggregation matrix per hierarchy level, mapping leaf areas to
+    every region at that level (depth from the root), so each roll-up is a single mat-vec.
+    Args:
+        parents: dict area -> parent or None
+        leaves : list of leaf areas (matrix columns), defaults to areas without children
+    Returns:
+        tuple: (leaves, list of (region names, csr_matrix of shape (regions, leaves)) ordered from the root down)
+    """
+    if leaves is None:
+        has_children = {p for p in parents.values() if p is not None}
+        leaves = [a for a in parents if a not in has_children]
+    leaves = list(leaves)
+
+    by_depth = {} # depth -> {region: [leaf columns]}
+    for col, leaf in enumerate(leaves):
+        chain = _ancestors(parents, leaf)
+        for height, region in enumerate(chain):
+            depth = len(chain) - 1 - height
+            by_depth.setdefault(depth, {}).setdefault(region, []).append(col)
+
+    levels = []
+    for depth in sorted(by_depth):
+        regions = list(by_depth[depth])
+        rows = np.concatenate([np.full(len(by_depth[depth][r]), i) for i, r in enumerate(regions)])
+        cols = np.concatenate([by_depth[depth][r] for r in regions])
+        matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(regions), len(leaves)))
+        levels.append((regions, matrix))
+    return leaves, levels
+
+def roll_up(life, pop, levels):
+    """
+    Population-weighted roll-up of leaf life expectancy to every hierarchy level.
+    Args:
+        life, pop: np.ndarray of shape (leaves, genders, years) aligned with the matrix columns
+        levels   : list of (region names, matrix) from build_rollup_matrices
+    Returns:
+        tuple: (regions, life expectancy (regions, genders, years), population (regions, genders, years))
+    """
+    n_leaves = life.shape[0]
+    present = ~np.isnan(life)
+    weighted = np.nan_to_num(life * pop).reshape(n_leaves, -1)
+    weights = np.nan_to_num(np.where(present, pop, 0.0)).reshape(n_leaves, -1)
+    counts = present.reshape(n_leaves, -1).astype(float)
+
+    regions, rolled_life, rolled_pop = [], [], []
+    for names, matrix in levels:
+        numerator, denominator = matrix @ weighted, matrix @ weights # One sparse mat-vec per gender/year block
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rolled = np.where(matrix @ counts > 0, numerator / denominator, np.nan)
+        regions += names
+        rolled_life.append(rolled.reshape((len(names),) + life.shape[1:]))
+        rolled_pop.append((matrix @ np.nan_to_num(pop).reshape(n_leaves, -1)).reshape((len(names),) + life.shape[1:]))
+    return regions, np.concatenate(rolled_life), np.concatenate(rolled_pop)
+
+def compare_with_published(regions, rolled_life, years, mean_area):
+    """
+    Compare rolled-up life expectancy with the region rows published in the data.
+    Args:
+        regions    : list of region names from roll_up
+        rolled_life: np.ndarray of shape (regions, genders, years)
+        years      : list of years (last axis)
+        mean_area  : dict of area -> gender -> year -> published life expectancy
+    Returns:
+        pd.DataFrame with columns ['area', 'gender', 'year', 'rolled_up', 'published', 'abs_diff']
+    """
+    records = []
+    for i, region in enumerate(regions):
+        if region not in mean_area:
+            continue
+        for j, g in enumerate(GENDERS):
+            for k, year in enumerate(years):
+                published = mean_area[region].get(g, {}).get(year)
+                if published is not None:
+                    records.append({'area': region, 'gender': g, 'year': year,
+                                    'rolled_up': rolled_life[i, j, k], 'published': published})
+    df = pd.DataFrame(records, columns=['area', 'gender', 'year', 'rolled_up', 'published'])
+    df['abs_diff'] = (df['rolled_up'] - df['published']).abs()
+    return df
+
+def check_rollups(hierarchy_path=REGION_HIERARCHY_FILE, use_cache=True, variant=None, tolerance=0.5):
+    """
+    Roll leaf-level data up the registry and compare every level with the published region rows.
+    Args:
+        hierarchy_path: str, mapping file for load_region_hierarchy
+        use_cache     : bool, use the binary CSV cache when loading
+        variant       : UN projection variant, defaults to config.VARIANT
+        tolerance     : float, maximum absolute difference in years counted as agreement
+    Returns:
+        pd.DataFrame: per area and gender, the max abs difference and whether it is within tolerance
+    """
+    from config import VARIANT
+    from data_processing import read_life_expectancy_data, calculate_mean_life_expectancy, calculate_population, build_cube
+
+    parents, _ = load_region_hierarchy(hierarchy_path)
+    leaves, levels = build_rollup_matrices(parents)
+    life_dfs, pop_dfs = read_life_expectancy_data(use_cache=use_cache, areas=list(parents), variants=variant or VARIANT)
+    mean_area = calculate_mean_life_expectancy(life_dfs, areas=list(parents))
+    pop_area = calculate_population(pop_dfs, areas=list(parents))
+    life, _, years = build_cube(mean_area, areas=leaves)
+    pop, _, _ = build_cube(pop_area, areas=leaves, years=years)
+
+    regions, rolled_life, _ = roll_up(life, pop, levels)
+    diffs = compare_with_published(regions, rolled_life, years, mean_area)
+    summary = diffs.groupby(['area', 'gender'], sort=False)['abs_diff'].max().reset_index(name='max_abs_diff')
+    summary['agrees'] = summary['max_abs_diff'] <= tolerance
+    return summary
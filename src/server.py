@@ -0,0 +1,187 @@
+import json
+import math
+import threading
+import traceback
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+from config import GENDERS, VARIANT
+from data_processing import (read_life_expectancy_data, calculate_mean_life_expectancy, calculate_population,
+                             prepare_area_life_expectancy_df, build_cube, weighted_mean)
+from stats_utils import ttest_table, perform_anova
+
+def _json_safe(value):
+    """Convert NumPy scalars and NaN/inf to plain JSON values (NaN becomes null)."""
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return _json_safe(value.tolist())
+    if isinstance(value, (np.integer, np.floating)):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+class QueryService:
+    """
+    Holds the aggregated area x gender x year cube in memory and answers slice queries
+    from an LRU result cache. reload() swaps in freshly loaded data atomically.
+    """
+
+    def __init__(self, use_cache=True, variant=VARIANT, cache_size=1024):
+        self.use_cache = use_cache
+        self.variant = variant
+        self._lock = threading.Lock()
+        self._query = lru_cache(maxsize=cache_size)(self._compute)
+        self.generation = 0
+        self.reload()
+
+    def reload(self):
+        """Reload data/raw (all areas and years), rebuild the cube and clear the result cache."""
+        life_dfs, pop_dfs = read_life_expectancy_data(use_cache=self.use_cache, variants=self.variant)
+        mean_area = calculate_mean_life_expectancy(life_dfs) # Every area and year in the data
+        pop_area = calculate_population(pop_dfs)
+        life, areas, years = build_cube(mean_area)
+        pop, _, _ = build_cube(pop_area, areas=areas, years=years)
+        state = {'life': life, 'pop': pop, 'areas': areas, 'years': np.asarray(years),
+                 'area_df': prepare_area_life_expectancy_df(mean_area)}
+        with self._lock:
+            self._state = state
+            self.generation += 1
+            self._query.cache_clear()
+        return self.generation
+
+    def query(self, kind, **params):
+        """Answer a query through the LRU cache (keyed by data generation, kind and parameters)."""
+        return self._query(self.generation, kind, tuple(sorted(params.items())))
+
+    def _compute(self, generation, kind, params):
+        with self._lock: # A reload in flight only means the answer comes from the newer data
+            state = self._state
+        params = dict(params)
+        if kind == 'weighted':
+            return self._weighted(state, **params)
+        if kind == 'ttest':
+            return self._ttest(state, **params)
+        if kind == 'anova':
+            return self._anova(state, **params)
+        raise ValueError(f'Unknown query: {kind}')
+
+    @staticmethod
+    def _year_mask(state, start, end):
+        years = state['years']
+        start = years.min() if start is None else int(start)
+        end = years.max() if end is None else int(end)
+        return (years >= start) & (years <= end), int(start), int(end)
+
+    def _weighted(self, state, area=None, gender='both', start=None, end=None):
+        """Population-weighted life expectancy for one area (or the whole cube) over a year range."""
+        if gender not in GENDERS:
+            raise ValueError(f'Unknown gender: {gender}')
+        selected, start, end = self._year_mask(state, start, end)
+        j = GENDERS.index(gender)
+        life, pop = state['life'][:, j, selected], state['pop'][:, j, selected]
+        if area is not None:
+            if area not in state['areas']:
+                raise ValueError(f'Unknown area: {area}')
+            i = state['areas'].index(area)
+            life, pop = life[i:i + 1], pop[i:i + 1]
+        series = weighted_mean(life, pop, axis=0)
+        return {'area': area or 'all', 'gender': gender, 'start': start, 'end': end,
+                'weighted_life_expectancy': weighted_mean(life, pop, axis=(0, 1)),
+                'series': dict(zip(state['years'][selected].tolist(), series))}
+
+    def _slice(self, state, start, end, gender=None):
+        selected, start, end = self._year_mask(state, start, end)
+        area_df = state['area_df']
+        area_df = area_df[area_df['year'].isin(state['years'][selected])]
+        if gender is not None:
+            area_df = area_df[area_df['gender'] == gender]
+        return area_df, start, end
+
+    def _ttest(self, state, start=None, end=None):
+        """Male vs female Welch t-tests per area for a year range."""
+        area_df, start, end = self._slice(state, start, end)
+        table = ttest_table(area_df)
+        return {'start': start, 'end': end, 'results': table.reset_index().to_dict(orient='records')}
+
+    def _anova(self, state, start=None, end=None, gender=None):
+        """One-way ANOVA across areas for a year range and optional gender."""
+        area_df, start, end = self._slice(state, start, end, gender)
+        f_stat, p_val = perform_anova(area_df)
+        return {'start': start, 'end': end, 'gender': gender or 'all', 'F': f_stat, 'p-value': p_val}
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints:
+      GET  /weighted?area=&gender=&start=&end=
+      GET  /ttest?start=&end=
+      GET  /anova?start=&end=&gender=
+      GET  /health
+      POST /reload
+    """
+    service = None # Set by serve()
+
+    def _send(self, status, payload):
+        body = json.dumps(_json_safe(payload)).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        kind = url.path.strip('/')
+        try:
+            if kind == 'health':
+                info = self.service._query.cache_info()
+                self._send(200, {'generation': self.service.generation, 'cache_hits': info.hits,
+                                 'cache_misses': info.misses, 'cache_size': info.currsize})
+            elif kind in ('weighted', 'ttest', 'anova'):
+                self._send(200, self.service.query(kind, **params))
+            else:
+                self._send(404, {'error': f'Unknown endpoint: {url.path}'})
+        except (ValueError, TypeError) as e: # Bad query parameters
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            self._send_error(e)
+
+    def do_POST(self):
+        try:
+            if urlparse(self.path).path.strip('/') == 'reload':
+                self._send(200, {'generation': self.service.reload()})
+            else:
+                self._send(404, {'error': f'Unknown endpoint: {self.path}'})
+        except Exception as e:
+            self._send_error(e)
+
+    def _send_error(self, e):
+        """Log an unexpected failure and answer with a JSON 500 instead of dropping the connection."""
+        self.log_error('%s failed', self.requestline)
+        traceback.print_exc() # Full traceback on stderr (log_error would escape its newlines)
+        self._send(500, {'error': f'{type(e).__name__}: {e}'})
+
+def serve(host='127.0.0.1', port=8050, use_cache=True, variant=VARIANT):
+    """
+    Load the data once and serve queries until interrupted.
+    Args:
+        host     : str, bind address (localhost by default)
+        port     : int, port to listen on
+        use_cache: bool, use the binary CSV cache when (re)loading
+        variant  : UN projection variant to serve
+    """
+    QueryHandler.service = QueryService(use_cache=use_cache, variant=variant)
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    print(f"Serving life expectancy queries on http://{host}:{port} (POST /reload after data/raw changes)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,26 +1,416 @@
 import numpy as np
-from scipy.stats import ttest_ind, f_oneway
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from config import GENDERS
+from data_processing import build_cube, build_prefix_sums, window_moments
+
+def welch_from_moments(n1, m1, v1, n2, m2, v2):
+    """
+    Welch's unequal-variance t-test from group counts, means and sample variances (elementwise).
+    Returns:
+        tuple of np.ndarray (t, degrees of freedom, two-sided p-value); NaN where a group has under two values
+    """
+    from scipy.stats import t as t_dist # Imported on demand so non-stats runs skip scipy
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        se1, se2 = v1 / n1, v2 / n2
+        t = (m1 - m2) / np.sqrt(se1 + se2)
+        dof = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+        p = 2 * t_dist.sf(np.abs(t), dof)
+    return t, dof, p
+
+def ttest_table(df):
+    """
+    Welch t-tests between male and female life expectancy for every area in one pass.
+    Group counts, means and variances come from a single groupby, and the t statistic,
+    degrees of freedom, p-value and effect sizes are computed with array operations.
+    Args:
+        df: DataFrame with columns ['area','gender','life_expectancy']
+    Returns:
+        pd.DataFrame indexed by area with columns ['t', 'df', 'p-value', 'cohens_d', 'hedges_g'] (empty for an empty df)
+    """
+    columns = ['t', 'df', 'p-value', 'cohens_d', 'hedges_g']
+    if df.empty: # No rows to pivot (e.g. a year range outside the data): no areas to test
+        return pd.DataFrame({col: pd.Series(dtype=float) for col in columns}, index=pd.Index([], name='area'))
+    areas = df['area'].unique()
+    grouped = df.groupby(['area', 'gender'], observed=True)['life_expectancy']
+    stats = grouped.agg(['count', 'size', 'mean', 'var'])
+    stats.loc[stats['count'] < stats['size'], 'mean'] = np.nan # NaN values propagate, as in ttest_ind
+
+    wide = stats.unstack('gender').reindex(areas)
+
+    def gender_stats(gender):
+        if gender not in wide['size']:
+            missing = np.full(len(areas), np.nan)
+            return missing, missing, missing
+        return tuple(wide[col][gender].to_numpy(float) for col in ('size', 'mean', 'var'))
+
+    n1, m1, v1 = gender_stats('male')
+    n2, m2, v2 = gender_stats('female')
+
+    t, dof, p = welch_from_moments(n1, m1, v1, n2, m2, v2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pooled_sd = np.sqrt(((n1 - 1) * v1 + (n2 - 1) * v2) / (n1 + n2 - 2))
+        cohens_d = (m1 - m2) / pooled_sd
+        hedges_g = cohens_d * (1 - 3 / (4 * (n1 + n2) - 9))
+
+    return pd.DataFrame(dict(zip(columns, (t, dof, p, cohens_d, hedges_g))), index=pd.Index(areas, name='area'))
 
 def perform_ttest(df):
     """"
     Perform t-tests between male and female life expectancy for each area.
     """
-    results = {}
-    for area in df['area'].unique():
-        subset = df[df['area']==area]
-        male_vals = subset[subset['gender']=='male']['life_expectancy']
-        female_vals = subset[subset['gender']=='female']['life_expectancy']
-        if len(male_vals)>0 and len(female_vals)>0:
-            t, p = ttest_ind(male_vals,female_vals,equal_var=False)
-        else:
-            t, p = np.nan, np.nan
-        results[area] = p
-    return results
+    return ttest_table(df)['p-value'].to_dict()
 
 def perform_anova(df):
     """
     Perform one-way ANOVA across all areas.
     """
+    from scipy.stats import f_oneway
+
     groups = [df[df['area']==area]['life_expectancy'].dropna() for area in df['area'].unique()]
     f_stat, p_val = f_oneway(*groups) # Unpack groups for f_oneway
-    return f_stat, p_val
\ No newline at end of file
+    return f_stat, p_val
+
+def _permutation_f_chunk(values, codes, n_groups, f_observed, n_permutations, seed_seq, batch_size):
+    """
+    Count permutations of the values over the group labels whose F statistic reaches the observed one.
+    Group sizes are fixed under permutation, so each F needs only the group sums, computed for a
+    whole (batch, observations) block with one bincount over row-offset group codes.
+    Args:
+        values        : np.ndarray of observations
+        codes         : np.ndarray of int group codes, one per observation
+        n_groups      : number of groups
+        f_observed    : observed F statistic
+        n_permutations: permutations in this chunk
+        seed_seq      : np.random.SeedSequence for this chunk
+        batch_size    : permutations per bincount
+    Returns:
+        int, number of permuted F statistics >= f_observed
+    """
+    rng = np.random.default_rng(seed_seq)
+    n_obs = len(values)
+    counts = np.bincount(codes, minlength=n_groups)
+    ss_total = ((values - values.mean()) ** 2).sum()
+    correction = values.sum() ** 2 / n_obs
+    exceed = 0
+    for start in range(0, n_permutations, batch_size):
+        size = min(batch_size, n_permutations - start)
+        shuffled = rng.permuted(np.broadcast_to(values, (size, n_obs)), axis=1)
+        offsets = codes + n_groups * np.arange(size)[:, None] # Row r's groups map to bins r*k .. r*k+k-1
+        sums = np.bincount(offsets.ravel(), weights=shuffled.ravel(), minlength=size * n_groups).reshape(size, n_groups)
+        ss_between = (sums ** 2 / counts).sum(axis=1) - correction
+        with np.errstate(invalid='ignore', divide='ignore'):
+            f = (ss_between / (n_groups - 1)) / ((ss_total - ss_between) / (n_obs - n_groups))
+        exceed += int((f >= f_observed * (1 - 1e-12)).sum()) # Tolerance so ties with the observed F count
+    return exceed
+
+def permutation_anova(df, n_permutations=9999, seed=0, workers=None, chunk_size=20_000, batch_size=2_000,
+                      group='area', value='life_expectancy'):
+    """
+    One-way ANOVA with a permutation p-value and effect sizes, for groups that are not normal
+    or have unequal variances. Permutations are split into fixed-size chunks, each with a seed
+    spawned from `seed`, so results are reproducible regardless of the number of workers.
+    Args:
+        df            : DataFrame with the group and value columns (missing values dropped)
+        n_permutations: number of random label permutations
+        seed          : int, root seed
+        workers       : int, worker processes (None for all cores, 1 to run in-process)
+        chunk_size    : int, permutations per worker task
+        batch_size    : int, permutations per vectorized block
+        group         : grouping column
+        value         : value column
+    Returns:
+        dict with 'F', 'p-value' (F distribution), 'perm p-value', 'eta_sq', 'omega_sq',
+        'df_between', 'df_within' and 'permutations'
+    """
+    from scipy.stats import f as f_dist
+
+    data = df.dropna(subset=[value])
+    codes, labels = pd.factorize(data[group])
+    values = data[value].to_numpy(float)
+    n_groups, n_obs = len(labels), len(values)
+    df_between, df_within = n_groups - 1, n_obs - n_groups
+
+    counts = np.bincount(codes, minlength=n_groups)
+    sums = np.bincount(codes, weights=values, minlength=n_groups)
+    ss_total = ((values - values.mean()) ** 2).sum()
+    ss_between = (sums ** 2 / counts).sum() - values.sum() ** 2 / n_obs
+    ms_within = (ss_total - ss_between) / df_within
+    f_observed = (ss_between / df_between) / ms_within
+
+    sizes = [min(chunk_size, n_permutations - start) for start in range(0, n_permutations, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(values, codes, n_groups, f_observed, size, seq, batch_size) for size, seq in zip(sizes, seeds)]
+    if workers == 1 or len(args) <= 1:
+        exceed = sum(_permutation_f_chunk(*a) for a in args)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            exceed = sum(pool.map(_permutation_f_chunk, *zip(*args)))
+
+    return {
+        'F': float(f_observed),
+        'p-value': float(f_dist.sf(f_observed, df_between, df_within)),
+        'perm p-value': (exceed + 1) / (n_permutations + 1), # Counts the observed labelling as one permutation
+        'eta_sq': float(ss_between / ss_total),
+        'omega_sq': float((ss_between - df_between * ms_within) / (ss_total + ms_within)),
+        'df_between': df_between,
+        'df_within': df_within,
+        'permutations': n_permutations,
+    }
+
+def group_summary(df, group='area', value='life_expectancy'):
+    """
+    Sufficient statistics per group from a single groupby (missing values dropped).
+    Returns:
+        tuple: (group labels, counts, means, sample variances) as arrays in first-seen order
+    """
+    stats = df.dropna(subset=[value]).groupby(group, sort=False, observed=True)[value].agg(['count', 'mean', 'var'])
+    return stats.index.to_numpy(), stats['count'].to_numpy(float), stats['mean'].to_numpy(), stats['var'].to_numpy()
+
+def adjust_pvalues(p, method='holm'):
+    """
+    Multiple-testing correction of an array of p-values (NaNs are left out of the family).
+    Args:
+        p     : array of p-values
+        method: 'holm' (step-down FWER), 'bh' (Benjamini-Hochberg FDR), 'bonferroni' or 'none'
+    Returns:
+        np.ndarray of adjusted p-values
+    """
+    p = np.asarray(p, dtype=float)
+    adjusted = np.full(p.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p))
+    m = len(valid)
+    if method == 'none' or m == 0:
+        return p.copy()
+    if method == 'bonferroni':
+        adjusted[valid] = np.minimum(p[valid] * m, 1)
+        return adjusted
+    order = valid[np.argsort(p[valid], kind='stable')]
+    ranks = np.arange(1, m + 1)
+    if method == 'holm':
+        stepped = np.maximum.accumulate((m - ranks + 1) * p[order])
+    elif method == 'bh':
+        stepped = np.minimum.accumulate((m / ranks * p[order])[::-1])[::-1]
+    else:
+        raise ValueError(f'Unknown correction: {method}')
+    adjusted[order] = np.minimum(stepped, 1)
+    return adjusted
+
+def _range_tail_table(k, n_w=4000, w_max=40.0, n_z=2001):
+    """
+    Upper tail of the range of k standard normals, P(range > w), tabulated on a w grid.
+    Uses 1 - P(range <= w) = 1 - k * integral phi(z) * (Phi(z) - Phi(z - w))^(k-1) dz.
+    """
+    from scipy.special import ndtr
+
+    w = np.linspace(0, w_max, n_w)
+    z = np.linspace(-10, 10, n_z)
+    phi = np.exp(-z ** 2 / 2) / np.sqrt(2 * np.pi)
+    tail = np.empty(n_w)
+    for start in range(0, n_w, 500): # Bounded (500, n_z) blocks
+        block = w[start:start + 500, None]
+        inner = np.clip(ndtr(z) - ndtr(z - block), 0, 1) ** (k - 1)
+        tail[start:start + 500] = 1 - k * (phi * inner).sum(axis=1) * (z[1] - z[0]) # Integrand ~0 at both ends
+    return w, np.clip(tail, 1e-300, 1)
+
+def studentized_range_sf(q, k, dof, n_s=96):
+    """
+    Vectorized survival function of the studentized range distribution.
+    P(Q > q) = E[P(range > q * s)] with s = sqrt(chi2(dof) / dof); the infinite-dof tail is tabulated
+    once for k and the expectation over s is a log-spaced quadrature per element, so thousands of
+    (q, dof) pairs cost a few array operations instead of one numerical integration each.
+    Args:
+        q  : array of studentized range statistics
+        k  : int, number of groups
+        dof: scalar or array of degrees of freedom (broadcast against q)
+        n_s: quadrature points over s
+    Returns:
+        np.ndarray of p-values
+    """
+    from scipy.special import gammaln
+    from scipy.stats import chi2
+
+    q, dof = np.broadcast_arrays(np.asarray(q, dtype=float), np.asarray(dof, dtype=float))
+    w, tail = _range_tail_table(k)
+    log_tail = np.log(tail)
+    out = np.full(q.shape, np.nan)
+    valid = np.isfinite(q) & np.isfinite(dof) & (dof > 0)
+    qv, dv = q[valid], dof[valid]
+    for start in range(0, len(qv), 20_000): # Bounded (chunk, n_s) quadrature arrays
+        qc, dc = qv[start:start + 20_000, None], dv[start:start + 20_000, None]
+        lo = np.sqrt(chi2.ppf(1e-12, dc) / dc)
+        hi = np.sqrt(chi2.isf(1e-12, dc) / dc)
+        s = np.exp(np.log(lo) + (np.log(hi) - np.log(lo)) * np.linspace(0, 1, n_s)) # (chunk, n_s)
+        # Density of s = sqrt(chi2/dof), times ds for the log-spaced grid (ds = s dlog s)
+        log_f = (np.log(2) + (dc / 2) * np.log(dc / 2) - gammaln(dc / 2) + dc * np.log(s) - dc * s ** 2 / 2)
+        weights = np.exp(log_f - log_f.max(axis=1, keepdims=True))
+        weights /= weights.sum(axis=1, keepdims=True)
+        integrand = np.exp(np.interp(np.minimum(qc * s, w[-1]), w, log_tail))
+        out[np.flatnonzero(valid)[start:start + 20_000]] = np.clip((weights * integrand).sum(axis=1), 0, 1)
+    return out
+
+def pairwise_posthoc(df, method='games-howell', correction='holm', group='area', value='life_expectancy'):
+    """
+    All-pairs post-hoc comparison of group means, following a one-way ANOVA.
+    Group sufficient statistics are computed once and every pair is evaluated by broadcasting.
+    Args:
+        df        : DataFrame with the group and value columns
+        method    : 'welch' (pairwise Welch t-tests), 'games-howell' (unequal variances) or
+                    'tukey' (Tukey HSD, pooled variance)
+        correction: multiple-testing correction for 'p-adj' (see adjust_pvalues); Games-Howell and
+                    Tukey p-values already control the family-wise error, so 'none' is usual for them
+        group     : grouping column
+        value     : value column
+    Returns:
+        pd.DataFrame with columns ['group1', 'group2', 'diff', 'se', 'statistic', 'df', 'p-value', 'p-adj'],
+        one row per pair in group order
+    """
+    from scipy.stats import t as t_dist
+
+    labels, n, mean, var = group_summary(df, group, value)
+    i, j = np.triu_indices(len(labels), k=1)
+    diff = mean[i] - mean[j]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if method == 'tukey':
+            dof = n.sum() - len(labels)
+            mse = np.nansum((n - 1) * var) / dof # Pooled within-group variance
+            se = np.sqrt(mse / 2 * (1 / n[i] + 1 / n[j]))
+            stat = np.abs(diff) / se
+            dof = np.full(len(diff), dof)
+            p = studentized_range_sf(stat, len(labels), dof)
+        elif method in ('welch', 'games-howell'):
+            se1, se2 = var[i] / n[i], var[j] / n[j]
+            dof = (se1 + se2) ** 2 / (se1 ** 2 / (n[i] - 1) + se2 ** 2 / (n[j] - 1))
+            if method == 'welch':
+                se = np.sqrt(se1 + se2)
+                stat = diff / se
+                p = 2 * t_dist.sf(np.abs(stat), dof)
+            else:
+                se = np.sqrt((se1 + se2) / 2)
+                stat = np.abs(diff) / se
+                p = studentized_range_sf(stat, len(labels), dof)
+        else:
+            raise ValueError(f'Unknown post-hoc method: {method}')
+
+    return pd.DataFrame({'group1': labels[i], 'group2': labels[j], 'diff': diff, 'se': se, 'statistic': stat,
+                         'df': dof, 'p-value': p, 'p-adj': adjust_pvalues(p, correction)})
+
+
+def period_comparison(mean_area, windows, genders=GENDERS):
+    """
+    Compare arbitrary year windows for every area and gender in one run.
+    Prefix sums along the year axis are built once, so each window's moments (and the Welch
+    tests on them) cost O(1) per group however long the windows are.
+    Args:
+        mean_area: AreaTable or dict of area -> gender -> year -> life expectancy
+        windows  : list of inclusive (start, end) year windows; the first is the baseline.
+                   ValueError if a window holds no values at all
+        genders  : genders to compare
+    Returns:
+        tuple of DataFrames:
+        - windows: one row per area (plus 'All areas', pooled) x gender x window with columns
+          ['area', 'gender', 'window', 'n', 'mean', 'std', 'diff', 't', 'df', 'p-value'],
+          where diff and the Welch test compare the window with the baseline window
+        - genders: one row per window with the male vs female Welch test pooled over all areas
+    """
+    cube, areas, years = build_cube(mean_area, genders=genders)
+    prefix = build_prefix_sums(cube, years)                       # (areas, genders, years + 1)
+    for key in ('n', 'sum', 'sumsq'):                               # Pooled 'All areas' row, same shift
+        prefix[key] = np.concatenate([prefix[key], prefix[key].sum(axis=0, keepdims=True)])
+    labels = list(areas) + ['All areas']
+
+    moments = [window_moments(prefix, start, end) for start, end in windows] # Each (n, mean, var) of (areas+1, genders)
+    empty = [f'{start}-{end}' for (start, end), (n, _, _) in zip(windows, moments) if not n[-1].any()]
+    if empty:
+        covered = f'{years[0]}-{years[-1]}' if len(years) else 'no years'
+        raise ValueError(f"No data in window(s) {', '.join(empty)} (the loaded data covers {covered})")
+    n0, m0, v0 = moments[0]
+    rows = []
+    for (start, end), (n, m, v) in zip(windows, moments):
+        t, dof, p = welch_from_moments(n, m, v, n0, m0, v0)
+        rows.append(pd.DataFrame({
+            'area': np.repeat(labels, len(genders)),
+            'gender': np.tile(genders, len(labels)),
+            'window': f'{start}-{end}',
+            'n': n.ravel(), 'mean': m.ravel(), 'std': np.sqrt(v).ravel(), 'diff': (m - m0).ravel(),
+            't': t.ravel(), 'df': dof.ravel(), 'p-value': p.ravel(),
+        }))
+    window_table = pd.concat(rows, ignore_index=True)
+    window_table.loc[window_table['window'] == window_table['window'].iloc[0], ['t', 'df', 'p-value']] = np.nan
+
+    gender_rows = []
+    if {'male', 'female'} <= set(genders):
+        i, j = genders.index('male'), genders.index('female')
+        for (start, end), (n, m, v) in zip(windows, moments):
+            t, dof, p = welch_from_moments(n[-1, i], m[-1, i], v[-1, i], n[-1, j], m[-1, j], v[-1, j])
+            gender_rows.append({'window': f'{start}-{end}', 'n': int(n[-1, i] + n[-1, j]),
+                                'male': m[-1, i], 'female': m[-1, j], 'diff': m[-1, i] - m[-1, j],
+                                't': float(t), 'df': float(dof), 'p-value': float(p)})
+    gender_table = pd.DataFrame(gender_rows, columns=['window', 'n', 'male', 'female', 'diff', 't', 'df', 'p-value'])
+    return window_table, gender_table
+
+
+def _bootstrap_chunk(num, den, n_replicates, seed_seq, resample, batch_size):
+    """
+    Draw bootstrap replicates of the weighted mean for one chunk with its own RNG stream.
+    Each batch is one (batch, areas) weight matrix times the (areas, cells) sums.
+    Args:
+        num, den    : np.ndarray of shape (areas, cells), life x population and population sums
+        n_replicates: int, replicates in this chunk
+        seed_seq    : np.random.SeedSequence for this chunk
+        resample    : 'regions', 'weights' or 'both'
+        batch_size  : int, replicates per matrix operation
+    Returns:
+        np.ndarray of shape (n_replicates, cells)
+    """
+    rng = np.random.default_rng(seed_seq)
+    n_areas = num.shape[0]
+    out = np.empty((n_replicates, num.shape[1]))
+    for start in range(0, n_replicates, batch_size):
+        size = min(batch_size, n_replicates - start)
+        weights = np.ones((size, n_areas))
+        if resample in ('regions', 'both'):
+            weights *= rng.multinomial(n_areas, np.full(n_areas, 1 / n_areas), size=size) # Resample regions with replacement
+        if resample in ('weights', 'both'):
+            weights *= rng.dirichlet(np.ones(n_areas), size=size) * n_areas # Bayesian bootstrap of population weights
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[start:start + size] = (weights @ num) / (weights @ den)
+    return out
+
+def bootstrap_weighted_life_expectancy(life, pop, n_replicates, seed=0, ci=0.95, resample='regions',
+                                       workers=None, chunk_size=25_000, batch_size=5_000):
+    """
+    Bootstrap confidence intervals for the population-weighted global life expectancy.
+    Replicates are split into fixed-size chunks, each with a seed spawned from `seed`,
+    so results are reproducible regardless of the number of workers.
+    Args:
+        life, pop   : np.ndarray of shape (areas, genders, years) from build_cube
+        n_replicates: int, number of bootstrap replicates
+        seed        : int, root seed
+        ci          : float, confidence level of the interval
+        resample    : 'regions' (areas with replacement), 'weights' (Dirichlet weights) or 'both'
+        workers     : int, worker processes (None for all cores, 1 to run in-process)
+        chunk_size  : int, replicates per worker task
+        batch_size  : int, replicates per matrix operation
+    Returns:
+        tuple: (lower, upper) arrays of shape (genders, years)
+    """
+    present = ~np.isnan(life)
+    n_areas = life.shape[0]
+    num = np.nan_to_num(life * pop).reshape(n_areas, -1)
+    den = np.nan_to_num(np.where(present, pop, 0.0)).reshape(n_areas, -1)
+
+    sizes = [min(chunk_size, n_replicates - start) for start in range(0, n_replicates, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(num, den, size, seq, resample, batch_size) for size, seq in zip(sizes, seeds)]
+    if workers == 1 or len(args) == 1:
+        chunks = [_bootstrap_chunk(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_bootstrap_chunk, *zip(*args)))
+
+    replicates = np.concatenate(chunks)
+    alpha = (1 - ci) / 2
+    lower, upper = np.nanquantile(replicates, [alpha, 1 - alpha], axis=0)
+    return lower.reshape(life.shape[1:]), upper.reshape(life.shape[1:])
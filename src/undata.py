@@ -0,0 +1,149 @@
+import os
+import glob
+import zipfile
+import hashlib
+import pandas as pd
+import numpy as np
+from config import CACHE_DIR, CHUNKSIZE
+
+UNDATA_COLUMNS = ['Country or Area', 'Year(s)', 'Variant', 'Value']
+
+def _cache_paths(path, cache_dir, filters=None):
+    """
+    Build the cache file path for a CSV slice from its absolute path, size, mtime and filters.
+    Args:
+        path     : str, CSV file path
+        cache_dir: str, directory holding cached .npz files
+        filters  : dict of filters applied while reading (part of the key)
+    Returns:
+        tuple: (cache file path, glob pattern matching any cached version of the same slice)
+    """
+    stat = os.stat(path)
+    path_key = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+    filter_key = hashlib.sha1(repr(sorted((filters or {}).items())).encode()).hexdigest()[:8]
+    state_key = hashlib.sha1(f'{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()[:16]
+    return (os.path.join(cache_dir, f'{path_key}_{filter_key}_{state_key}.npz'),
+            os.path.join(cache_dir, f'{path_key}_{filter_key}_*.npz'))
+
+def _write_npz_cache(df, cache_path, stale_pattern):
+    """
+    Store a DataFrame as typed columns in an .npz file, replacing older versions.
+    Text columns are stored as fixed-width unicode with a separate missing-value mask.
+    """
+    arrays = {'__columns__': np.array(df.columns, dtype=str)}
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        if values.dtype.kind in 'biuf':
+            arrays[f'c{i}'] = values
+        else:
+            mask = pd.isna(values)
+            arrays[f'c{i}'] = np.where(mask, '', values.astype(str)).astype(str)
+            arrays[f'm{i}'] = mask
+
+    for stale in glob.glob(stale_pattern): # Drop caches of earlier file versions
+        os.remove(stale)
+    tmp_path = f'{cache_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, cache_path) # Atomic swap so readers never see a partial file
+
+def _read_npz_cache(cache_path):
+    """Rebuild a DataFrame from an .npz file written by _write_npz_cache."""
+    with np.load(cache_path, allow_pickle=False) as data:
+        columns = {}
+        for i, col in enumerate(data['__columns__'].tolist()):
+            values = data[f'c{i}']
+            if f'm{i}' in data:
+                values = np.where(data[f'm{i}'], None, values.astype(object))
+            columns[col] = values
+    return pd.DataFrame(columns)
+
+def normalise_filters(areas=None, years=None, variants=None):
+    """Turn filter arguments into sorted tuples (None means no filter) for reading and cache keys."""
+    filters = {}
+    if areas is not None:
+        filters['areas'] = tuple(sorted(areas))
+    if years is not None:
+        filters['years'] = tuple(sorted(int(y) for y in years))
+    if variants is not None:
+        filters['variants'] = tuple(sorted([variants] if isinstance(variants, str) else variants))
+    return filters
+
+def read_undata_csv(path, areas=None, years=None, variants=None, chunksize=CHUNKSIZE):
+    """
+    Stream a UNdata export in chunks, keeping only the rows that match the filters.
+    Peak memory follows the selected slice plus one chunk, not the file size.
+    Footnote rows at the end of UNdata exports are dropped (their year is not numeric).
+    Args:
+        path     : str, CSV file path
+        areas    : iterable of 'Country or Area' names to keep, None for all
+        years    : iterable of years to keep, None for all
+        variants : str or iterable of 'Variant' values to keep, None for all
+        chunksize: int, rows parsed per chunk
+    Returns:
+        pd.DataFrame with columns ['Country or Area', 'Year(s)', 'Variant', 'Value']
+    """
+    filters = normalise_filters(areas, years, variants)
+    keep_areas = set(filters.get('areas', ()))
+    keep_years = set(filters.get('years', ()))
+    keep_variants = set(filters.get('variants', ()))
+
+    parts = []
+    reader = pd.read_csv(path, usecols=UNDATA_COLUMNS, dtype={'Year(s)': str, 'Value': str}, chunksize=chunksize)
+    for chunk in reader:
+        # Cheap string filters first so numeric parsing only touches surviving rows
+        if 'areas' in filters:
+            chunk = chunk[chunk['Country or Area'].isin(keep_areas)]
+        if 'variants' in filters:
+            chunk = chunk[chunk['Variant'].isin(keep_variants)]
+        year = pd.to_numeric(chunk['Year(s)'], errors='coerce')
+        mask = year.notna()
+        if 'years' in filters:
+            mask &= year.isin(keep_years)
+        if mask.any():
+            selected = chunk.loc[mask, UNDATA_COLUMNS].copy()
+            selected['Year(s)'] = year[mask].astype('int64')
+            selected['Value'] = pd.to_numeric(selected['Value'], errors='coerce')
+            parts.append(selected)
+
+    if not parts:
+        return pd.DataFrame({col: pd.Series(dtype='int64' if col == 'Year(s)' else 'float64' if col == 'Value' else object)
+                             for col in UNDATA_COLUMNS})
+    return pd.concat(parts, ignore_index=True)
+
+def _read_undata_file(path, member=None, **filters):
+    """read_undata_csv on a CSV file, or on one CSV member of a zip archive."""
+    if member is None:
+        return read_undata_csv(path, **filters)
+    with zipfile.ZipFile(path) as archive, archive.open(member) as f:
+        return read_undata_csv(f, **filters)
+
+def read_csv_cached(path, cache_dir=CACHE_DIR, use_cache=True, areas=None, years=None, variants=None, member=None):
+    """
+    Read a UNdata CSV slice, serving it from a binary .npz cache when the file has not changed.
+    The cache is keyed by file path, size, mtime and the filters, so edited or replaced
+    exports are re-parsed automatically and each slice is cached separately.
+    Args:
+        path     : str, CSV file path (or zip archive path with `member`)
+        cache_dir: str, directory holding cached .npz files
+        use_cache: bool, if False always parse the CSV and leave the cache untouched
+        areas, years, variants: filters passed to read_undata_csv
+        member   : str, CSV file inside the zip archive at `path`
+    Returns:
+        pd.DataFrame
+    """
+    filters = {'areas': areas, 'years': years, 'variants': variants}
+    if not use_cache:
+        return _read_undata_file(path, member, **filters)
+
+    key = normalise_filters(areas, years, variants)
+    if member is not None:
+        key['member'] = member
+    cache_path, stale_pattern = _cache_paths(path, cache_dir, key)
+    if os.path.exists(cache_path):
+        return _read_npz_cache(cache_path)
+
+    df = _read_undata_file(path, member, **filters)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_npz_cache(df, cache_path, stale_pattern)
+    return df
@@ -1,73 +1,359 @@
-import matplotlib.pyplot as plt
-import plotly.express as px
+import os
+import glob
 import numpy as np
 from config import WHO_AREAS_COORDINATES
 
+# matplotlib and plotly are imported on first use, so each plot type only pays for its own backend
+
+def _pyplot():
+    """Import pyplot, selecting the headless Agg backend unless MPLBACKEND is set."""
+    import matplotlib
+    if 'MPLBACKEND' not in os.environ:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
 def plot_global_life_expectancy(global_data, colours, file_path):
     """
     Create a line plot for global average life expectancy (both sexes, male, and female).
     
     Args:
-        global_data: dict with keys 'year', 'both', 'male', 'female' containing life expectancy values
+        global_data: dict with keys 'year', 'both', 'male', 'female' containing life expectancy values,
+                     plus optional '<gender>_lower'/'<gender>_upper' confidence bounds drawn as bands
         colours    : list of color hex codes for plotting each gender
         file_path  : directory path to save the figure
     """
-    plt.figure(figsize=(10,6))
+    plt = _pyplot()
+    fig = plt.figure(figsize=(10,6))
 
     for g, c in zip(['both','male','female'], colours):
         plt.plot(global_data['year'], global_data[g], marker='o', color=c, label=g.capitalize())
+        if f'{g}_lower' in global_data: # Bootstrap confidence band
+            plt.fill_between(global_data['year'], global_data[f'{g}_lower'], global_data[f'{g}_upper'], color=c, alpha=0.25)
 
-    plt.title('Global Average Life Expectancy (2019-2024)')
+    plt.title(f"Global Average Life Expectancy ({global_data['year'][0]}-{global_data['year'][-1]})")
     plt.xlabel('Year')
     plt.ylabel('Life Expectancy (years)')
     plt.grid(True)
     plt.legend()
-    plt.savefig(f'{file_path}/global_average_life_expectancy.png')
+    fig.savefig(f'{file_path}/global_average_life_expectancy.png')
+    plt.close(fig) # Release the figure so repeated renders do not accumulate memory
+
+def _area_cube(area_df, areas, genders, years):
+    """
+    Pivot the long area DataFrame once into an area x gender x year array (missing cells are NaN).
+    Returns:
+        ndarray of shape (len(areas), len(genders), len(years))
+    """
+    import pandas as pd
+    cube = np.full((len(areas), len(genders), len(years)), np.nan)
+    a = pd.Categorical(area_df['area'], categories=areas).codes
+    g = pd.Categorical(area_df['gender'], categories=genders).codes
+    y = pd.Categorical(area_df['year'], categories=years).codes
+    keep = (a >= 0) & (g >= 0) & (y >= 0) # Rows outside the requested labels are ignored
+    cube[a[keep], g[keep], y[keep]] = area_df['life_expectancy'].to_numpy(dtype=float)[keep]
+    return cube
+
+class _ImagePdf:
+    """
+    Minimal PDF writer with one full-page image per page, each written to disk as it is added.
+    matplotlib's PdfPages holds every embedded image in memory until it is closed, which for
+    dozens of full-resolution pages runs into gigabytes.
+    """
+
+    def __init__(self, path, size_inches):
+        self.file = open(path, 'wb')
+        self.width, self.height = (72 * s for s in size_inches) # Page size in points
+        self.offsets = {} # object number -> byte offset
+        self.pages = []
+        self.file.write(b'%PDF-1.4\n')
+
+    def _object(self, number, body, stream=None):
+        self.offsets[number] = self.file.tell()
+        self.file.write(f'{number} 0 obj\n'.encode() + body)
+        if stream is not None:
+            self.file.write(b'\nstream\n' + stream + b'\nendstream')
+        self.file.write(b'\nendobj\n')
+
+    def add_page(self, image):
+        """Append an (height, width, 3 or 4) uint8 image as a page (alpha is dropped)."""
+        import zlib
+        rows = np.ascontiguousarray(image[..., :3]).reshape(image.shape[0], -1)
+        filtered = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2 # PNG 'Up' predictor: flat plot regions compress to almost nothing
+        filtered[0, 1:] = rows[0]
+        filtered[1:, 1:] = rows[1:] - rows[:-1]
+        data = zlib.compress(filtered.tobytes())
+        number = 3 + 3 * len(self.pages) # 1 and 2 are the catalog and page tree
+        self._object(number, (f'<< /Type /XObject /Subtype /Image /Width {image.shape[1]} /Height {image.shape[0]} '
+                              f'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode /DecodeParms '
+                              f'<< /Predictor 12 /Colors 3 /BitsPerComponent 8 /Columns {image.shape[1]} >> '
+                              f'/Length {len(data)} >>').encode(), data)
+        content = f'q {self.width:.2f} 0 0 {self.height:.2f} 0 0 cm /Im Do Q'.encode()
+        self._object(number + 1, f'<< /Length {len(content)} >>'.encode(), content)
+        self._object(number + 2, (f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.width:.2f} {self.height:.2f}] '
+                                  f'/Resources << /XObject << /Im {number} 0 R >> >> /Contents {number + 1} 0 R >>').encode())
+        self.pages.append(number + 2)
 
-def plot_area_life_expectancy(area_df, colours, areas, file_path):
+    def close(self):
+        kids = ' '.join(f'{n} 0 R' for n in self.pages)
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        self._object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>'.encode())
+        xref = self.file.tell()
+        size = max(self.offsets) + 1
+        self.file.write(f'xref\n0 {size}\n0000000000 65535 f \n'.encode())
+        self.file.write(''.join(f'{self.offsets[n]:010d} 00000 n \n' for n in range(1, size)).encode())
+        self.file.write(f'trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+        self.file.close()
+
+def plot_area_life_expectancy(area_df, colours, areas, file_path, per_page=6, page_format='pdf'):
     """
     Create bar plots of life expectancy by WHO area and gender for each year.
+    Up to `per_page` years share one figure; longer ranges are paged by updating the bar
+    heights of that same figure rather than rebuilding the axes.
 
     Args:
-        area_df  : DataFrame with columns ['area','year','gender','life_expectancy']
-        colours  : list of color hex codes for plotting each gender
-        areas    : list of WHO areas (used for consistent x-axis labels)
-        file_path: directory path to save the figure
+        area_df    : DataFrame with columns ['area','year','gender','life_expectancy']
+        colours    : list of color hex codes for plotting each gender
+        areas      : list of WHO areas (used for consistent x-axis labels)
+        file_path  : directory path to save the figure
+        per_page   : number of years (panels) per page
+        page_format: 'pdf' to also write every page to area_average_life_expectancy.pdf,
+                     or 'png' to write pages 2.. as area_average_life_expectancy_p<n>.png
+    Returns:
+        list of written file paths (the first page is always area_average_life_expectancy.png)
     """
-    fig, axes = plt.subplots(2,3,figsize=(16,10),sharey=True)
-    width = 0.25
+    plt = _pyplot()
+    from matplotlib.collections import PolyCollection
+    genders = ['both', 'male', 'female']
     years = sorted(area_df['year'].unique())
-    for i, year in enumerate(years):
-        ax = axes[i//3,i%3]
-        y_data = area_df[area_df['year']==year]
-        for j, (g,c) in enumerate(zip(['both','male','female'], colours)):
-            subset = y_data[y_data['gender']==g]
-            x = np.arange(len(subset['area']))
-            ax.bar(x+(j-1)*width, subset['life_expectancy'], width, label=g.capitalize(), color=c, alpha=0.7)
-        ax.set_title(f'Life Expectancy by Area ({year})')
-        ax.set_xticks(np.arange(len(areas)))
-        ax.set_xticklabels(areas, rotation=45, ha='right')
+    cube = np.nan_to_num(_area_cube(area_df, areas, genders, years)) # Missing bars are drawn flat
+    n_pages = max(1, -(-len(years) // per_page))
+
+    # Grid adapts to the number of areas (fewer, wider columns for many areas) and years per page
+    many = len(areas) > 30 # Label only the bottom row when tick labels would dominate draw time
+    ncols = max(1, min(3, per_page, len(years), 60 // max(len(areas), 1)))
+    nrows = -(-min(per_page, max(len(years), 1)) // ncols)
+    panel_width = min(max(16 / 3, 0.12 * len(areas)), 24)
+    fig, axes = plt.subplots(nrows, ncols, figsize=(panel_width * ncols, 5 * nrows), sharey=True, squeeze=False)
+    axes = axes.ravel()
+
+    # Each gender's bars in a panel are one PolyCollection of rectangles; pages only rewrite their heights
+    width = 0.25
+    x = np.arange(len(areas))
+    verts = np.zeros((len(genders), len(areas), 4, 2))
+    for j in range(len(genders)):
+        left = x + (j-1)*width - width/2
+        verts[j, :, :, 0] = np.stack([left, left, left + width, left + width], axis=1)
+    bars = [] # bars[panel][gender] -> PolyCollection, reused across pages
+    for k, ax in enumerate(axes):
+        bars.append([ax.add_collection(PolyCollection(verts[j], facecolors=c, linewidths=0, alpha=0.7,
+                                                      label=g.capitalize()))
+                     for j, (g, c) in enumerate(zip(genders, colours))])
+        ax.autoscale_view()
+        if not many or k >= len(axes) - ncols:
+            ax.set_xticks(x)
+            ax.set_xticklabels(areas, rotation=45, ha='right', fontsize=10 if not many else 6)
+        else:
+            ax.set_xticks([])
         ax.grid(axis='y', linestyle='--', alpha=0.7)
+    if cube.size and cube.max() > 0:
+        axes[0].set_ylim(0, cube.max() * 1.05) # Fixed shared scale for every page
+
+    # Axes, ticks, labels and grid are identical on every page: draw them once without bars or titles,
+    # then blit each page's bars and titles onto a copy of that background (no text layout per page).
+    # A placeholder title per panel makes the layout reserve the title height before it is hidden.
+    for ax in axes:
+        ax.set_axisbelow(True) # Grid under the bars, so drawing the bars last keeps the stacking order
+        ax.set_title(f'Life Expectancy by Area ({max(years)})' if years else '')
+    collections = [c for panel in bars for c in panel]
+    hidden = collections + [ax.title for ax in axes]
     fig.tight_layout()
-    plt.savefig(f'{file_path}/area_average_life_expectancy.png')
+    fig.set_layout_engine('none')
+    for artist in hidden:
+        artist.set_visible(False)
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    for artist in hidden:
+        artist.set_visible(True)
+
+    outputs = [f'{file_path}/area_average_life_expectancy.png']
+    pdf = None
+    if n_pages > 1 and page_format == 'pdf':
+        outputs.append(f'{file_path}/area_average_life_expectancy.pdf')
+        pdf = _ImagePdf(outputs[-1], fig.get_size_inches()) # Pages are the rendered images, as in the PNGs
+    try:
+        for page in range(n_pages):
+            page_years = range(page * per_page, min((page + 1) * per_page, len(years)))
+            fig.canvas.restore_region(background)
+            for k, ax in enumerate(axes): # Panels past the last year stay empty so the labelled row remains
+                heights = cube[:, :, page_years[k]] if k < len(page_years) else np.zeros(cube.shape[:2])
+                for j, collection in enumerate(bars[k]):
+                    verts[j, :, 1:3, 1] = heights[:, j, None]
+                    collection.set_verts(verts[j])
+                    ax.draw_artist(collection)
+                for spine in ax.spines.values(): # Spines sit above the bars
+                    ax.draw_artist(spine)
+                ax.set_title(f'Life Expectancy by Area ({years[page_years[k]]})' if k < len(page_years) else '')
+                ax.draw_artist(ax.title)
+            image = np.asarray(fig.canvas.buffer_rgba())
+            if page == 0:
+                plt.imsave(outputs[0], image, dpi=fig.dpi)
+            elif page_format == 'png':
+                outputs.append(f'{file_path}/area_average_life_expectancy_p{page + 1}.png')
+                plt.imsave(outputs[-1], image, dpi=fig.dpi)
+            if pdf is not None:
+                pdf.add_page(image)
+    finally:
+        if pdf is not None:
+            pdf.close()
+        plt.close(fig)
 
-def plot_animated_map(area_df, file_path):
+    # Remove pages left by an earlier, longer run (or in the other page format)
+    for stale in glob.glob(f'{file_path}/area_average_life_expectancy_p*.png') + \
+            glob.glob(f'{file_path}/area_average_life_expectancy.pdf'):
+        if stale not in outputs:
+            os.remove(stale)
+    return outputs
+
+def plot_animated_map(area_df, file_path, renderer='geo', include_plotlyjs='directory', frame_step=1,
+                      decimals=2, coordinates=None, topojson=None):
     """
-    Create an animated bubble map of life expectancy for 'both' gender by WHO area.
-    
+    Create an animated bubble map of life expectancy by area ('both' gender when available).
+
+    Args:
+        area_df         : DataFrame with columns ['area','year','gender','life_expectancy']
+        file_path       : directory path to save the HTML animation
+        renderer        : 'geo' (scatter_geo) or 'mapbox' (open-street-map tiles, needs network)
+        include_plotlyjs: 'directory' to reference one shared plotly.min.js next to the HTML,
+                          True to embed the bundle, or 'cdn'
+        frame_step      : keep every n-th year as an animation frame (at least 1)
+        decimals        : rounding of the frame data, stored as float32
+        coordinates     : dict area -> {'lat', 'lon'}, defaults to WHO_AREAS_COORDINATES
+        topojson        : local copy of plotly's world_110m.json for the 'geo' base map. It is written
+                          next to the HTML and plotly.js loads it from there instead of cdn.plot.ly, so
+                          the map needs no network when the directory is served over HTTP (browsers
+                          block fetches from file:// pages). Without it the base map comes from the CDN.
+    """
+    import pandas as pd
+    import plotly.express as px
+
+    coordinates = WHO_AREAS_COORDINATES if coordinates is None else coordinates
+    gender = 'both' if (area_df['gender'] == 'both').any() else area_df['gender'].iloc[0]
+    both_data = area_df[(area_df['gender']==gender) & (area_df['area']!='World')] # Exclude 'World' for mapping
+
+    if frame_step < 1:
+        raise ValueError(f'frame_step must be at least 1, got {frame_step}')
+    years = sorted(both_data['year'].unique())[::frame_step] # Optional frame decimation
+    both_data = both_data[both_data['year'].isin(years)]
+
+    coords = pd.DataFrame.from_dict(coordinates, orient='index')[['lat', 'lon']].astype('float32')
+    both_data = both_data.join(coords, on='area', how='inner') # Vectorized coordinate lookup; unmapped areas drop out
+
+    life = both_data['life_expectancy'].astype('float32').round(decimals) # Compact frame data
+    span = life.max() - life.min()
+    scaled_size = (life - life.min()) / span * 100 if span > 0 else pd.Series(50.0, index=life.index)
+    both_data = both_data.assign(life_expectancy=life, scaled_size=scaled_size.round(1).astype('float32'))
+
+    title = f'Life Expectancy by Region ({years[0]}-{years[-1]})' if years else 'Life Expectancy by Region'
+    common = dict(lat='lat', lon='lon', color='life_expectancy', size='scaled_size', hover_name='area',
+                  animation_frame='year', size_max=40, color_continuous_scale='YlOrBr', title=title)
+    if renderer == 'mapbox':
+        fig = px.scatter_mapbox(both_data, zoom=1, **common)
+        fig.update_layout(mapbox_style='open-street-map') # Use open-street-map style
+    else:
+        fig = px.scatter_geo(both_data, projection='natural earth', **common)
+    config = {}
+    if topojson and renderer != 'mapbox':
+        import shutil
+        shutil.copyfile(topojson, f'{file_path}/world_110m.json') # Name plotly.js asks for: <scope>_<resolution>m.json
+        config['topojsonURL'] = './'                                # Relative to the HTML, not cdn.plot.ly
+    fig.write_html(f'{file_path}/life_expectancy_animation.html', include_plotlyjs=include_plotlyjs, config=config)
+
+def _hierarchy_order(areas, parents):
+    """
+    Areas in depth-first order of the region tree (each region followed by its children,
+    siblings in data order); areas missing from the tree come last.
+    """
+    position = {area: i for i, area in enumerate(areas)}
+    children = {}
+    for area, parent in parents.items():
+        children.setdefault(parent, []).append(area)
+    ordered, stack = [], sorted(children.get(None, []), key=lambda a: -position.get(a, len(areas)))
+    while stack:
+        node = stack.pop()
+        if node in position:
+            ordered.append(node)
+        stack.extend(sorted(children.get(node, []), key=lambda a: -position.get(a, len(areas))))
+    return ordered + [a for a in areas if a not in set(ordered)]
+
+def _cluster_order(matrix):
+    """Row order of hierarchical (average-linkage) clustering; missing cells take their column mean."""
+    from scipy.cluster.hierarchy import linkage, leaves_list
+
+    if len(matrix) < 3:
+        return np.arange(len(matrix))
+    with np.errstate(invalid='ignore'):
+        filled = np.where(np.isnan(matrix), np.nanmean(matrix, axis=0), matrix)
+    return leaves_list(linkage(np.nan_to_num(filled), method='average'))
+
+def plot_heatmap(area_df, file_path, row_order='cluster', hierarchy=None, annotate_max=400):
+    """
+    Create a heatmap of life expectancy by area (rows) and year (columns), 'both' gender when available.
+    The values are pivoted once into an array and drawn as a single rasterized image, so
+    hundreds of areas by hundreds of years render as quickly as a handful.
+
     Args:
-        area_df  : DataFrame with columns ['area','year','gender','life_expectancy']
-        file_path: directory path to save the HTML animation
+        area_df     : DataFrame with columns ['area','year','gender','life_expectancy']
+        file_path   : directory path to save the figure
+        row_order   : 'cluster' (hierarchical clustering of the rows), 'hierarchy' (region tree order)
+                      or 'none' (data order)
+        hierarchy   : region mapping file for 'hierarchy', defaults to config.REGION_HIERARCHY_FILE
+        annotate_max: write the values into the cells when there are at most this many
     """
-    both_data = area_df[(area_df['gender']=='both') & (area_df['area']!='World')].copy() # Exclude 'World' for mapping
-    both_data['lat'] = both_data['area'].map(lambda x: WHO_AREAS_COORDINATES[x]['lat']) # Get latitudes
-    both_data['lon'] = both_data['area'].map(lambda x: WHO_AREAS_COORDINATES[x]['lon']) # Get longitudes
-
-    both_data['scaled_size'] = (both_data['life_expectancy'] - both_data['life_expectancy'].min()) / \
-                                (both_data['life_expectancy'].max() - both_data['life_expectancy'].min())*100
-    fig = px.scatter_mapbox(both_data, lat='lat', lon='lon', color='life_expectancy',
-                            size='scaled_size', hover_name='area', animation_frame='year',
-                            size_max=40, zoom=1, color_continuous_scale='YlOrBr',
-                            title='Life Expectancy by WHO Region (2019-2024)')
-    fig.update_layout(mapbox_style='open-street-map') # Use open-street-map style
-    fig.write_html(f'{file_path}/life_expectancy_animation.html')
+    plt = _pyplot()
+    gender = 'both' if (area_df['gender'] == 'both').any() else area_df['gender'].iloc[0]
+    areas = area_df['area'].unique().tolist()
+    years = sorted(area_df['year'].unique())
+    matrix = _area_cube(area_df[area_df['gender'] == gender], areas, [gender], years)[:, 0, :]
+
+    if row_order == 'cluster':
+        order = _cluster_order(matrix)
+    elif row_order == 'hierarchy':
+        from regions import load_region_hierarchy
+        from config import REGION_HIERARCHY_FILE
+        parents, _ = load_region_hierarchy(hierarchy or REGION_HIERARCHY_FILE)
+        position = {a: i for i, a in enumerate(areas)}
+        order = np.array([position[a] for a in _hierarchy_order(areas, parents)], dtype=int)
+    else:
+        order = np.arange(len(areas))
+    matrix = matrix[order]
+    labels = [areas[i] for i in order]
+
+    n_rows, n_cols = matrix.shape
+    fig, ax = plt.subplots(figsize=(min(max(8, 0.08 * n_cols + 4), 20), min(max(5, 0.14 * n_rows + 2), 14)))
+    image = ax.imshow(np.ma.masked_invalid(matrix), cmap='YlGnBu', aspect='auto', interpolation='nearest')
+    image.set_rasterized(True)
+    fig.colorbar(image, ax=ax, label='Life Expectancy (years)')
+
+    # At most ~60 row and ~30 year labels, so tick text never dominates draw time
+    row_step, col_step = max(1, -(-n_rows // 60)), max(1, -(-n_cols // 30))
+    ax.set_yticks(np.arange(0, n_rows, row_step))
+    ax.set_yticklabels(labels[::row_step], fontsize=10 if n_rows <= 30 else 6)
+    ax.set_xticks(np.arange(0, n_cols, col_step))
+    ax.set_xticklabels(years[::col_step], rotation=90 if n_cols > 20 else 0, fontsize=10 if n_cols <= 30 else 7)
+    if matrix.size <= annotate_max:
+        for (i, j), value in np.ndenumerate(matrix):
+            if not np.isnan(value):
+                ax.text(j, i, f'{value:.1f}', ha='center', va='center', fontsize=8,
+                        color='white' if image.norm(value) > 0.6 else 'black') # Readable on dark cells
+
+    ax.set_title(f'Life Expectancy by Area and Year ({gender})')
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Area')
+    image.set_visible(False) # The layout only depends on the labels, so skip resampling the image for it
+    fig.tight_layout()
+    fig.set_layout_engine('none')
+    image.set_visible(True)
+    fig.savefig(f'{file_path}/heatmap.png')
+    plt.close(fig)